@@ -0,0 +1,227 @@
+"""
+This module reads the monthly archives published at `data.police.uk/data
+<https://data.police.uk/data/>`_. Each archive is a zip file holding one CSV per
+force per month, reading them is much faster than sending thousands of `poly=`
+requests to the API when the area being analysed is large.
+"""
+
+import zipfile
+
+import pandas as pd
+
+from crime_hotspots_uk.spatial import assign_areas
+
+# How many rows of each CSV are read into memory at once
+chunk_size = 100000
+
+# Map the column names used in the street level crime CSVs to the column names
+# produced by flattening the JSON returned by the crimes-street API method
+street_columns = {
+    "Crime ID": "persistent_id",
+    "Month": "month",
+    "Longitude": "location.longitude",
+    "Latitude": "location.latitude",
+    "Location": "location.street.name",
+    "Crime type": "category",
+    "Last outcome category": "outcome_status.category",
+    "Context": "context",
+}
+
+# Map the column names used in the stop and search CSVs to the column names
+# produced by flattening the JSON returned by the stops-street API method. The
+# archives do not include street names so `location.street.name` is left empty
+search_columns = {
+    "Type": "type",
+    "Date": "datetime",
+    "Part of a policing operation": "operation",
+    "Policing operation": "operation_name",
+    "Latitude": "location.latitude",
+    "Longitude": "location.longitude",
+    "Gender": "gender",
+    "Age range": "age_range",
+    "Self-defined ethnicity": "self_defined_ethnicity",
+    "Officer-defined ethnicity": "officer_defined_ethnicity",
+    "Legislation": "legislation",
+    "Object of search": "object_of_search",
+    "Outcome": "outcome",
+    "Outcome linked to object of search": "outcome_linked_to_object_of_search",
+    "Removal of more intimate clothing": "removal_of_more_intimate_clothing",
+}
+
+# The end of the file names of each kind of CSV inside the archives
+file_endings = {
+    "crimes-street": "-street.csv",
+    "stops-street": "-stop-and-search.csv",
+}
+
+
+def archive_members(archive, usage, months=None, forces=None, seen=None):
+    """List the CSV files in an archive that hold a certain kind of data
+
+    The files in the archives are named like
+    `2021-03/2021-03-west-yorkshire-street.csv`, so files for months or forces
+    that are not needed can be skipped without opening them. The archives
+    published each month overlap, so the same file can be in several of them.
+
+    :param archive: An open archive
+    :type archive: zipfile.ZipFile
+    :param usage: Either `crimes-street` or `stops-street`
+    :type usage: string
+    :param months: The months to keep in the format yyyy-mm, if this is None all
+        months are kept
+    :type months: list, optional
+    :param forces: The forces to keep, using the names in the file names such
+        as `west-yorkshire`. If this is None all forces are kept
+    :type forces: list, optional
+    :param seen: The (force, month, usage) of the files already read from
+        other archives, these are skipped and the files that are returned are
+        added to it
+    :type seen: set, optional
+
+    :return: The names of the matching files
+    :rtype: list
+    """
+    ending = file_endings[usage]
+
+    members = []
+    for member in archive.namelist():
+        file_name = member.rsplit("/", 1)[-1]
+        if not file_name.endswith(ending):
+            continue
+
+        # The first 7 characters are the month and the force is whatever is
+        # between the month and the file ending
+        month = file_name[:7]
+        force = file_name[8 : -len(ending)]
+
+        if months is not None and month not in months:
+            continue
+        if forces is not None and force not in forces:
+            continue
+
+        # Anti-social behaviour has no crime id, so rows read twice can't be
+        # told apart afterwards and the whole file has to be skipped
+        if seen is not None:
+            if (force, month, usage) in seen:
+                continue
+            seen.add((force, month, usage))
+
+        members.append(member)
+
+    return members
+
+
+def read_archive(
+    path, usage, shapes, names, months=None, forces=None, categories=None, seen=None
+):
+    """Stream the rows of an archive that fall inside a set of areas
+
+    The CSVs are read straight out of the zip file a chunk at a time, so the
+    archive never has to be unpacked to disk or held in memory all at once.
+    Each chunk is clipped to the areas using a spatial index and only the rows
+    inside an area are kept.
+
+    :param path: The path to the zip file downloaded from data.police.uk
+    :type path: string
+    :param usage: Either `crimes-street` or `stops-street`
+    :type usage: string
+    :param shapes: The boundaries of the areas to keep rows for
+    :type shapes: list
+    :param names: The name of each area in shapes, this is added to the output
+        in the `area name` column
+    :type names: list
+    :param months: The months to keep in the format yyyy-mm, if this is None all
+        months are kept
+    :type months: list, optional
+    :param forces: The forces to keep, if this is None all forces are kept
+    :type forces: list, optional
+    :param categories: A dictionary mapping the crime types used in the archive
+        (such as `Violence and sexual offences`) to the categories used by the
+        API (such as `violent-crime`). Only crimes with a type in the dictionary
+        are kept. If this is None all crimes are kept and the types are left as
+        they are in the archive
+    :type categories: dict, optional
+    :param seen: The (force, month, usage) of the files already read from
+        other archives, these files are skipped and the files read from this
+        archive are added to it
+    :type seen: set, optional
+
+    :return: The rows that fell inside an area, with the same column names as
+        the flattened API responses and an extra `area name` column. If no rows
+        were found None is returned
+    :rtype: pandas.DataFrame
+    """
+    if usage == "crimes-street":
+        columns = street_columns
+    else:
+        columns = search_columns
+
+    frames = []
+
+    with zipfile.ZipFile(path) as archive:
+        for member in archive_members(archive, usage, months, forces, seen):
+            with archive.open(member) as csv:
+                chunks = pd.read_csv(
+                    csv,
+                    usecols=lambda column: column in columns,
+                    dtype=str,
+                    chunksize=chunk_size,
+                )
+
+                for chunk in chunks:
+                    chunk = chunk.rename(columns=columns)
+
+                    # Some crimes have no location, they can never be inside
+                    # an area so drop them straight away
+                    chunk = chunk.dropna(
+                        subset=["location.latitude", "location.longitude"]
+                    )
+
+                    if categories is not None:
+                        chunk = chunk[chunk["category"].isin(categories.keys())]
+                        chunk = chunk.assign(category=chunk["category"].map(categories))
+
+                    if chunk.shape[0] == 0:
+                        continue
+
+                    clipped = clip(chunk, shapes, names)
+                    if clipped is not None:
+                        frames.append(clipped)
+
+    if len(frames) == 0:
+        return
+
+    crimes = pd.concat(frames, ignore_index=True)
+
+    if "location.street.name" not in crimes.columns:
+        crimes["location.street.name"] = None
+
+    return crimes
+
+
+def clip(rows, shapes, names):
+    """Keep only the rows that fall inside one of a set of areas
+
+    :param rows: Rows with `location.latitude` and `location.longitude` columns
+    :type rows: pandas.DataFrame
+    :param shapes: The boundaries of the areas
+    :type shapes: list
+    :param names: The name of each area in shapes
+    :type names: list
+
+    :return: The rows inside an area with the name of the area in the `area
+        name` column. A row inside two areas appears twice, once for each area.
+        If no rows were inside an area None is returned
+    :rtype: pandas.DataFrame
+    """
+    point_index, area_index = assign_areas(
+        rows["location.latitude"], rows["location.longitude"], shapes
+    )
+
+    if len(point_index) == 0:
+        return
+
+    clipped = rows.iloc[point_index].reset_index(drop=True)
+    clipped["area name"] = [names[i] for i in area_index]
+
+    return clipped
@@ -0,0 +1,732 @@
+"""
+This module handles the on disk cache of downloaded data. The data is stored as
+Parquet files partitioned by location type, area, usage, category and month, so
+reading it back only touches the files and columns that are needed and every
+column keeps the type it had when it was written.
+
+Each location type also has a manifest that records every partition that is
+known about, including months where there was no data. Looking a partition up
+in the manifest means the cache never has to check whether a file exists, and
+months that are known to be empty are never requested from the API again.
+
+The manifest also records how big each file is and when it was last used, so
+the cache can be kept under a size budget by removing the least recently used
+data, and when it was fetched, so recent months that forces may still revise
+are downloaded again once they go stale.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from crime_hotspots_uk.constants import (
+    cache_budget,
+    cache_directory,
+    cache_ttls,
+    max_workers,
+    settled_ttl,
+)
+from crime_hotspots_uk.files import atomic_write
+
+# The key in the Parquet metadata that lists the columns whose True and False
+# values were written as strings
+mixed_key = b"crime_hotspots_uk.mixed"
+
+
+class Cache:
+    """The cached data for one location type and usage
+
+    The files are laid out as
+    `<location type>/<area>/<usage>/<category>/<month>.parquet` under the cache
+    directory. Stop and search data has no category so that level is left out.
+    The manifest and the high-water mark of each area and category are saved
+    as `<location type>/manifest.json`.
+    """
+
+    def __init__(
+        self, location_type, usage, directory=cache_directory, budget=cache_budget
+    ):
+        """
+        :param location_type: The name of the location type the data is for,
+            for instance `Constituincy`
+        :type location_type: string
+        :param usage: Either `crimes-street` or `stops-street`
+        :type usage: string
+        :param directory: Where the cache is stored
+        :type directory: string, optional
+        :param budget: The most space the cache for the location type can take
+            up in bytes, if this is None the cache can grow without limit
+        :type budget: int, optional
+        """
+        self.location_type = location_type
+        self.usage = usage
+        self.budget = budget
+        self.directory = Path(os.path.expanduser(directory)) / location_type
+        self.manifest_path = self.directory / "manifest.json"
+
+        self.manifest = self.load_manifest()
+
+        # Keep track of the entries that have been removed so they aren't
+        # brought back when the manifest is merged with the saved one
+        self.forgotten = set()
+
+        # The last month that has been downloaded for each area and category
+        self.marks = self.load_marks()
+
+    def path(self, area, category, month, usage=None):
+        """Get the path of the file holding one partition of the cache
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param month: The month in the format yyyy-mm
+        :type month: string
+        :param usage: The usage the partition is for, if this is None the usage
+            of the cache is used
+        :type usage: string, optional
+
+        :return: The path to the file
+        :rtype: pathlib.Path
+        """
+        if usage is None:
+            usage = self.usage
+
+        directory = self.directory / str(area) / usage
+        if category is not None:
+            directory = directory / str(category)
+        return directory / (str(month) + ".parquet")
+
+    def key(self, area, category, month):
+        """Get the key used for a partition in the manifest
+
+        :return: A tuple of the area, usage, category and month
+        :rtype: tuple
+        """
+        return (str(area), self.usage, category, str(month))
+
+    def lookup(self, area, category, month):
+        """Get what is known about a partition of the cache
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param month: The month in the format yyyy-mm
+        :type month: string
+
+        :return: The manifest entry for the partition, with the number of
+            `rows`, the number of `bytes` the file takes up and the times it was
+            `fetched` and last `accessed` at (in seconds since the epoch). If
+            the partition isn't known or has gone stale None is returned
+        :rtype: dict
+        """
+        entry = self.manifest.get(self.key(area, category, month))
+
+        if entry is None or self.expired(month, entry):
+            return
+
+        entry["accessed"] = time.time()
+        return entry
+
+    def mark(self, area, category):
+        """Get the high-water mark for an area and category
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+
+        :return: The last month that has been downloaded in the format yyyy-mm,
+            or None if nothing has been downloaded yet
+        :rtype: string
+        """
+        return self.marks.get(self.mark_key(area, category))
+
+    def set_mark(self, area, category, month):
+        """Set the high-water mark for an area and category
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param month: The last month that has been downloaded
+        :type month: string
+        """
+        self.marks[self.mark_key(area, category)] = str(month)
+
+    def mark_key(self, area, category):
+        """Get the key used for a high-water mark
+
+        :return: The area, usage and category joined by `/`
+        :rtype: string
+        """
+        return "/".join([str(area), self.usage, str(category)])
+
+    def ttl(self, month):
+        """Get how long the data for a month stays fresh for
+
+        :param month: The month in the format yyyy-mm
+        :type month: string
+
+        :return: The number of seconds the data stays fresh for
+        :rtype: float
+        """
+        today = date.today()
+        year, number = str(month)[:7].split("-")
+        age = (today.year - int(year)) * 12 + today.month - int(number)
+
+        days = settled_ttl
+        for max_age, ttl in cache_ttls:
+            if age <= max_age:
+                days = ttl
+                break
+
+        return days * 24 * 60 * 60
+
+    def expired(self, month, entry):
+        """Check if a manifest entry has gone stale
+
+        :param month: The month the entry is for in the format yyyy-mm
+        :type month: string
+        :param entry: The manifest entry
+        :type entry: dict
+
+        :return: True if the data should be downloaded again
+        :rtype: bool
+        """
+        return time.time() - entry["fetched"] > self.ttl(month)
+
+    def write(self, crimes, area, category, month):
+        """Write one partition of the cache
+
+        Partitions with no rows are only recorded in the manifest, no file is
+        written for them.
+
+        :param crimes: The data for the area, category and month
+        :type crimes: pandas.DataFrame
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param month: The month in the format yyyy-mm
+        :type month: string
+        """
+        self.write_all([(crimes, area, category, month)], workers=1)
+
+    def write_all(self, partitions, workers=max_workers):
+        """Write many partitions of the cache at once
+
+        The files are written from a pool of threads, pyarrow releases the GIL
+        while it encodes and writes a file so several are written at the same
+        time. The manifest is only updated once all the files have been written.
+
+        :param partitions: A tuple of the data, area, category and month for
+            each partition, in the same order as the arguments to write
+        :type partitions: list
+        :param workers: How many files can be written at the same time
+        :type workers: int, optional
+        """
+        full = []
+        for crimes, area, category, month in partitions:
+            if crimes.shape[0] == 0:
+                self.record_empty(area, category, month)
+            else:
+                full.append((crimes, area, category, month))
+
+        frames = [crimes for crimes, area, category, month in full]
+        paths = [
+            self.path(area, category, month) for crimes, area, category, month in full
+        ]
+
+        if workers <= 1 or len(full) <= 1:
+            sizes = [
+                self.write_file(crimes, path) for crimes, path in zip(frames, paths)
+            ]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                sizes = list(pool.map(self.write_file, frames, paths))
+
+        for (crimes, area, category, month), size in zip(full, sizes):
+            self.record(area, category, month, {"rows": crimes.shape[0], "bytes": size})
+
+    def write_file(self, crimes, path):
+        """Write a dataframe to a Parquet file
+
+        The data is written to a temporary file first and then moved into place,
+        so if the program is stopped part way through the old file is left as
+        it was rather than half written.
+
+        :param crimes: The data to write
+        :type crimes: pandas.DataFrame
+        :param path: Where to write the file
+        :type path: pathlib.Path
+
+        :return: The size of the file in bytes
+        :rtype: int
+        """
+        # Parquet columns have a single type, so columns that mix True and
+        # False with strings, like the outcome of a stop and search, have their
+        # booleans written as strings. The columns are listed in the metadata
+        # so they can be turned back when they are read
+        mixed = self.mixed_columns(crimes)
+        for name in mixed:
+            crimes = crimes.assign(**{name: self.encode_booleans(crimes[name])})
+
+        table = pa.Table.from_pandas(crimes, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[mixed_key] = json.dumps(mixed).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        atomic_write(path, lambda temporary: pq.write_table(table, temporary))
+
+        return path.stat().st_size
+
+    def mixed_columns(self, crimes):
+        """Find the columns that mix booleans with values of other types
+
+        :param crimes: The data to check
+        :type crimes: pandas.DataFrame
+
+        :return: The names of the columns
+        :rtype: list
+        """
+        mixed = []
+        for name, column in crimes.items():
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                values = column.cat.categories
+            elif column.dtype == object:
+                values = column.dropna().unique()
+            else:
+                continue
+
+            booleans = [isinstance(value, (bool, np.bool_)) for value in values]
+            if any(booleans) and not all(booleans):
+                mixed.append(name)
+
+        return mixed
+
+    def encode_booleans(self, column):
+        """Turn the True and False values of a column into strings
+
+        :param column: The column to change
+        :type column: pandas.Series
+
+        :return: The column with `True` and `False` in place of the booleans
+        :rtype: pandas.Series
+        """
+
+        def encode(value):
+            if isinstance(value, (bool, np.bool_)):
+                return str(bool(value))
+            return value
+
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.rename_categories(encode)
+        return column.map(encode)
+
+    def decode_booleans(self, column):
+        """Turn the `True` and `False` strings of a column back into booleans
+
+        :param column: The column to change
+        :type column: pandas.Series
+
+        :return: The column with booleans in place of the strings
+        :rtype: pandas.Series
+        """
+        booleans = {"True": True, "False": False}
+
+        def decode(value):
+            if isinstance(value, str):
+                return booleans.get(value, value)
+            return value
+
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.rename_categories(decode)
+        return column.astype(object).map(decode)
+
+    def record_empty(self, area, category, month):
+        """Record that there is no data for a partition
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param month: The month in the format yyyy-mm
+        :type month: string
+        """
+        self.record(area, category, month, {"rows": 0, "bytes": 0})
+
+    def record(self, area, category, month, entry):
+        """Add or replace the manifest entry for a partition
+
+        :param entry: The details of the partition, the time it was fetched and
+            accessed is added to it
+        :type entry: dict
+        """
+        key = self.key(area, category, month)
+
+        entry["fetched"] = time.time()
+        entry["accessed"] = entry["fetched"]
+        self.manifest[key] = entry
+        self.forgotten.discard(key)
+
+    def forget(self, area, category, month):
+        """Remove a partition from the manifest so it is downloaded again"""
+        key = self.key(area, category, month)
+
+        self.manifest.pop(key, None)
+        self.forgotten.add(key)
+
+    def read(self, area, category, months, columns=None):
+        """Read the cached data for an area and category
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param months: The months to read in the format yyyy-mm
+        :type months: list
+        :param columns: The columns to read, if this is None every column is
+            read
+        :type columns: list, optional
+
+        :return: The cached data or None if none of the months are cached. If
+            the months are cached but had no data an empty dataframe is returned
+        :rtype: pandas.DataFrame
+        """
+        crimes, missing = self.read_months(area, category, months, columns)
+        return crimes
+
+    def read_months(self, area, category, months, columns=None, workers=max_workers):
+        """Read every cached month for an area and category in one go
+
+        Which files exist is looked up in the manifest so months that are known
+        to be empty are never opened. The files that are needed are read at the
+        same time from a pool of threads, only the requested columns are read
+        from them, and they are joined into a single dataframe at the end.
+
+        :param area: The name of the area
+        :type area: string
+        :param category: The crime category, or None for stop and search data
+        :type category: string
+        :param months: The months to read in the format yyyy-mm
+        :type months: list
+        :param columns: The columns to read, if this is None every column is
+            read
+        :type columns: list, optional
+        :param workers: How many files can be read at the same time
+        :type workers: int, optional
+
+        :return: The cached data and a list of the months that aren't in the
+            cache and need downloading. The data is None if none of the months
+            are cached, or an empty dataframe if the cached months had no data
+        :rtype: tuple
+        """
+        missing = []
+        empty = []
+        stored = []
+        for month in months:
+            entry = self.lookup(area, category, month)
+            if entry is None:
+                missing.append(month)
+            elif entry["rows"] == 0:
+                empty.append(month)
+            else:
+                stored.append(month)
+
+        paths = [self.path(area, category, month) for month in stored]
+
+        def read(path):
+            # The file may have been deleted since the manifest was saved
+            try:
+                return self.read_file(path, columns)
+            except FileNotFoundError:
+                return
+
+        if workers <= 1 or len(paths) <= 1:
+            tables = [read(path) for path in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                tables = list(pool.map(read, paths))
+
+        # Forget the files that have gone so they are downloaded again
+        found = []
+        for month, table in zip(stored, tables):
+            if table is None:
+                self.forget(area, category, month)
+                missing.append(month)
+            else:
+                found.append(table)
+
+        # Keep the missing months in the order they were asked for
+        missing = [month for month in months if month in missing]
+
+        if len(found) == 0:
+            if len(empty) == 0:
+                return None, missing
+            return pd.DataFrame(), missing
+
+        # The months can be stored with different types, for instance a column
+        # that was empty in one month has a null type and categoricals with
+        # more values use bigger codes. Turn the categoricals back into plain
+        # values and let arrow promote the columns to a type that fits them all
+        mixed = set()
+        for table in found:
+            metadata = table.schema.metadata or {}
+            mixed.update(json.loads(metadata.get(mixed_key, b"[]")))
+
+        if not all(table.schema.equals(found[0].schema) for table in found):
+            found = [self.decode_dictionaries(table) for table in found]
+        table = pa.concat_tables(found, promote_options="permissive")
+
+        crimes = table.to_pandas()
+        for name in mixed:
+            if name in crimes.columns:
+                crimes[name] = self.decode_booleans(crimes[name])
+
+        return crimes, missing
+
+    def decode_dictionaries(self, table):
+        """Replace the dictionary encoded columns of a table with plain columns
+
+        :param table: The table to decode
+        :type table: pyarrow.Table
+
+        :return: The table with every categorical column stored as plain values
+        :rtype: pyarrow.Table
+        """
+        for i, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                column = table.column(i).cast(field.type.value_type)
+                table = table.set_column(i, field.name, column)
+
+        return table
+
+    def read_file(self, path, columns=None):
+        """Read a single file from the cache
+
+        :param path: The path to the file
+        :type path: pathlib.Path
+        :param columns: The columns to read, columns that are not in the file
+            are skipped. If this is None every column is read
+        :type columns: list, optional
+
+        :return: The data in the file
+        :rtype: pyarrow.Table
+        """
+        parquet = pq.ParquetFile(path)
+
+        if columns is not None:
+            names = parquet.schema_arrow.names
+            columns = [column for column in columns if column in names]
+
+        return parquet.read(columns=columns)
+
+    def load(self):
+        """Load the saved manifest file
+
+        A manifest that can't be read, for instance because it was cut short by
+        a crash in a version that wrote it in place, is treated as empty. The
+        files it listed are then downloaded again rather than the cache being
+        unusable.
+
+        :return: The contents of the file, with the `partitions` that are known
+            about and the high-water `marks`
+        :rtype: dict
+        """
+        try:
+            with open(self.manifest_path) as file:
+                saved = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"partitions": [], "marks": {}}
+
+        # Manifests saved before high-water marks were added are just a list
+        # of partitions
+        if isinstance(saved, list):
+            return {"partitions": saved, "marks": {}}
+
+        return saved
+
+    def load_marks(self):
+        """Load the high-water marks for the location type from disk
+
+        :return: The last month downloaded keyed by area, usage and category
+        :rtype: dict
+        """
+        return self.load()["marks"]
+
+    def load_manifest(self):
+        """Load the manifest for the location type from disk
+
+        :return: The manifest entries keyed by (area, usage, category, month)
+        :rtype: dict
+        """
+        manifest = {}
+        for record in self.load()["partitions"]:
+            key = (
+                record.pop("area"),
+                record.pop("usage"),
+                record.pop("category"),
+                record.pop("month"),
+            )
+            manifest[key] = record
+
+        return manifest
+
+    def save(self):
+        """Save the manifest to disk
+
+        The manifest is shared by every usage of the location type, so it is
+        reloaded and merged before saving to keep entries written by other
+        objects. It is written to a temporary file first and then moved into
+        place so the manifest is never left half written. If the cache has
+        grown past its budget it is pruned first.
+        """
+        manifest = self.load_manifest()
+        for key in self.forgotten:
+            manifest.pop(key, None)
+        manifest.update(self.manifest)
+        self.manifest = manifest
+
+        marks = self.load_marks()
+        marks.update(self.marks)
+        self.marks = marks
+
+        if self.budget is not None and self.size() > self.budget:
+            self.prune()
+
+        records = []
+        for (area, usage, category, month), entry in self.manifest.items():
+            record = {
+                "area": area,
+                "usage": usage,
+                "category": category,
+                "month": month,
+            }
+            record.update(entry)
+            records.append(record)
+
+        def write(temporary):
+            with open(temporary, "w") as file:
+                json.dump({"partitions": records, "marks": self.marks}, file)
+
+        atomic_write(self.manifest_path, write)
+
+    def size(self):
+        """Get how much space the cached files take up
+
+        :return: The size in bytes
+        :rtype: int
+        """
+        return sum(entry.get("bytes", 0) for entry in self.manifest.values())
+
+    def summary(self):
+        """Get a table of everything in the cache for the location type
+
+        :return: A row for each partition with its area, usage, category,
+            month, rows, bytes, when it was fetched and accessed and whether it
+            has expired
+        :rtype: pandas.DataFrame
+        """
+        records = []
+        for (area, usage, category, month), entry in self.manifest.items():
+            records.append(
+                {
+                    "area": area,
+                    "usage": usage,
+                    "category": category,
+                    "month": month,
+                    "rows": entry["rows"],
+                    "bytes": entry.get("bytes", 0),
+                    "fetched": pd.to_datetime(entry["fetched"], unit="s"),
+                    "accessed": pd.to_datetime(
+                        entry.get("accessed", entry["fetched"]), unit="s"
+                    ),
+                    "expired": self.expired(month, entry),
+                }
+            )
+
+        return pd.DataFrame(
+            records,
+            columns=[
+                "area",
+                "usage",
+                "category",
+                "month",
+                "rows",
+                "bytes",
+                "fetched",
+                "accessed",
+                "expired",
+            ],
+        )
+
+    def prune(self, budget=None):
+        """Remove stale data and keep the cache under its size budget
+
+        Every partition that has expired is removed, then the least recently
+        accessed partitions are removed until the cache fits in the budget.
+        Months recorded as empty take up no space, so they are only removed
+        once they expire and are never requested again until then.
+
+        :param budget: The most space the cache can take up in bytes, if this is
+            None the budget of the cache is used
+        :type budget: int, optional
+
+        :return: The number of partitions that were removed
+        :rtype: int
+        """
+        if budget is None:
+            budget = self.budget
+
+        removed = 0
+
+        for key, entry in list(self.manifest.items()):
+            if self.expired(key[3], entry):
+                self.remove(key)
+                removed += 1
+
+        if budget is None:
+            return removed
+
+        # Work through the partitions from least to most recently used
+        size = self.size()
+        order = sorted(
+            self.manifest.items(),
+            key=lambda item: item[1].get("accessed", item[1]["fetched"]),
+        )
+        for key, entry in order:
+            if size <= budget:
+                break
+
+            # Removing an empty month frees nothing and means asking for it again
+            if entry.get("bytes", 0) == 0:
+                continue
+
+            size -= entry.get("bytes", 0)
+            self.remove(key)
+            removed += 1
+
+        return removed
+
+    def remove(self, key):
+        """Delete a partition from the cache
+
+        :param key: The manifest key of the partition
+        :type key: tuple
+        """
+        area, usage, category, month = key
+
+        self.path(area, category, month, usage).unlink(missing_ok=True)
+
+        self.manifest.pop(key, None)
+        self.forgotten.add(key)
@@ -2,6 +2,83 @@ baseURL = "https://data.police.uk/api/"
 
 crime_categories_url = "https://data.police.uk/api/crime-categories?date=2020-08"
 
+# Lists the months the API has data for and which forces have published stop and
+# search data for each of them
+crime_dates_url = "https://data.police.uk/api/crimes-street-dates"
+
+# Finds the force responsible for a point, the point is added to the end as
+# `latitude,longitude`
+neighbourhood_url = "https://data.police.uk/api/locate-neighbourhood?q="
+
+# Where downloaded data is cached between runs
+cache_directory = "~/.crime_hotspots_cache"
+
+# How many days the crime categories and area boundaries are cached for
+metadata_ttl = 30
+
+# How many days the list of months the API has published data for is cached for,
+# a new month is published about once a month so this is kept short
+published_ttl = 1
+
+# The most space the cache for each location type can take up in bytes, when it
+# grows past this the least recently used data is removed
+cache_budget = 1024 ** 3
+
+# How many days cached data stays fresh for depending on how many months old the
+# data is. Forces revise their recent data so the newest months are refreshed
+# more often, anything older than the last entry uses settled_ttl
+cache_ttls = [(3, 7), (12, 30)]
+settled_ttl = 365
+
+# The police API allows 15 requests per second with bursts of up to 30, see
+# https://data.police.uk/docs/api-call-limits/
+rate_limit = 15
+rate_burst = 30
+
+# Number of requests that can be waiting on the API at the same time
+max_workers = 8
+
+# How many times a boundary can be split into quarters when the API says there
+# is too much data in it, the smallest part is 1/4**max_subdivisions of the area
+max_subdivisions = 8
+
+# The longest URL the API accepts, requests for boundaries with more points
+# than fit in this are split up
+max_url_length = 4094
+
+# When neighbouring areas are merged into one request the boundary is simplified
+# so it fits in one URL. The tolerance in degrees starts at request_tolerance and
+# is doubled up to max_simplifications times until the boundary is short enough
+request_tolerance = 0.0005
+max_simplifications = 8
+
+# How many seconds to wait for the API to respond to a request
+request_timeout = 60
+
+# Response codes that are worth retrying and how long to back off between
+# attempts (in seconds). 503 is not retried because the API uses it to say
+# there were more than 10,000 crimes in the area, asking again will not help
+retry_codes = [429, 500, 502, 504]
+max_retries = 5
+backoff_base = 0.5
+backoff_cap = 30
+
+
+# The furthest away in metres a descriptive place can be from a crime at a non
+# descriptive place (like a supermarket) and still be used to name it. If this is
+# None the nearest place is always used
+match_radius = None
+
+
+# The width of the grid cells used to find the density of crimes and the standard
+# deviation of the kernel used to smooth it, both in metres
+hotspot_cell_size = 100
+hotspot_bandwidth = 200
+
+# How close in metres two locations have to be to count as neighbours when testing
+# whether a hotspot is significant
+neighbour_distance = 500
+
 
 ignore = [
     "Sports/Recreation Area",
@@ -1,3 +1,4 @@
+from crime_hotspots_uk.constants import max_workers
 from crime_hotspots_uk.data import Root
 
 from crime_hotspots_uk.locations.constituincy import Constituincy
@@ -10,8 +11,24 @@ class Data(Root):
     political representation should be implemented here.
     """
 
-    def __init__(self, name, location_names, location_type=Constituincy):
+    def __init__(
+        self,
+        name,
+        location_names,
+        location_type=Constituincy,
+        workers=max_workers,
+        session=None,
+        offline=False,
+        fetch_all=False,
+    ):
 
         super().__init__(
-            name, location_names, location_type=Constituincy, usage="crime"
+            name,
+            location_names,
+            location_type=Constituincy,
+            usage="crime",
+            workers=workers,
+            session=session,
+            offline=offline,
+            fetch_all=fetch_all,
         )
@@ -0,0 +1,296 @@
+"""
+This module holds a count of the crimes in every combination of area, crime
+category, location type, location and month. Building the count takes one pass
+over the crimes, after that rankings and trends for any selection are found by
+picking out rows of an integer array and summing them, so the crimes never have
+to be filtered or counted again.
+
+Only the combinations that have crimes are stored. Each one is a row of integer
+codes, one for each dimension, with a matching row of counts holding a column for
+each month.
+"""
+
+import numpy as np
+import pandas as pd
+
+# The dimensions of the count other than the month, in the order they are coded
+dimensions = ["area name", "category", "Type", "location.street.name"]
+
+
+def month_range(first, last):
+    """Get every month from one month to another
+
+    :param first: The first month in the format yyyy-mm
+    :type first: string
+    :param last: The last month in the format yyyy-mm
+    :type last: string
+
+    :return: The months in the format yyyy-mm, oldest first
+    :rtype: list
+    """
+    return pd.period_range(first, last, freq="M").strftime("%Y-%m").tolist()
+
+
+class CountCube:
+    """The number of crimes in each area, category, location type, location and
+    month
+    """
+
+    def __init__(self):
+        # The label of each code along each dimension
+        self.labels = {
+            dimension: pd.Index([], dtype=object) for dimension in dimensions
+        }
+        self.months = pd.Index([], dtype=object)
+
+        # The codes of each combination with crimes and its count in each month
+        self.keys = np.zeros((0, len(dimensions)), dtype=np.int64)
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def encode(self, labels, values):
+        """Find the code of each value, adding new values to the labels
+
+        :param labels: The labels already given a code
+        :type labels: pandas.Index
+        :param values: The values to code
+        :type values: pandas.Series
+
+        :return: The labels with the new values added and the code of each value
+        :rtype: tuple
+        """
+        values = values.astype("category")
+        categories = values.cat.categories
+
+        # Missing values are given a label of their own
+        if (values.cat.codes.to_numpy() < 0).any():
+            categories = categories.append(pd.Index([np.nan], dtype=object))
+
+        new = categories[labels.get_indexer(categories) < 0]
+        labels = labels.append(new.astype(object))
+
+        # Only the categories are looked up, then each row picks the code of its
+        # category. A code of -1 picks the missing label at the end
+        lookup = labels.get_indexer(categories)
+        return labels, lookup[values.cat.codes.to_numpy()]
+
+    def add(self, crimes, months):
+        """Add crimes to the count
+
+        :param crimes: The crimes to add, a dimension that isn't one of the
+            columns (like the category of stop and searches) is given the label
+            `All`
+        :type crimes: pandas.DataFrame
+        :param months: The month of each crime in the format yyyy-mm
+        :type months: pandas.Series
+        """
+        codes = []
+        for dimension in dimensions:
+            if dimension in crimes.columns:
+                values = crimes[dimension]
+            else:
+                values = pd.Series("All", index=crimes.index)
+
+            self.labels[dimension], code = self.encode(self.labels[dimension], values)
+            codes.append(code)
+        codes = np.column_stack(codes)
+
+        # Add any new months as empty columns and keep the months in order
+        self.months, month_codes = self.encode(self.months, months)
+        order = np.argsort(self.months.to_numpy(dtype=str), kind="stable")
+        padding = len(self.months) - self.counts.shape[1]
+        counts = np.pad(self.counts, ((0, 0), (0, padding)))[:, order]
+        self.months = self.months[order]
+        month_codes = np.argsort(order)[month_codes]
+
+        # Find the row of each crime among the old and new combinations, the
+        # codes are packed into one number so they can be sorted quickly
+        shape = tuple(len(self.labels[dimension]) for dimension in dimensions)
+        packed = np.ravel_multi_index(np.concatenate([self.keys, codes]).T, shape)
+        packed, inverse = np.unique(packed, return_inverse=True)
+        keys = np.column_stack(np.unravel_index(packed, shape))
+
+        old_rows = inverse[: len(self.keys)]
+        new_rows = inverse[len(self.keys) :]
+
+        self.counts = np.zeros((len(keys), len(self.months)), dtype=np.int64)
+        self.counts[old_rows] = counts
+
+        # Count all the new crimes with one bincount over the flattened array
+        cells = new_rows * len(self.months) + month_codes
+        self.counts += np.bincount(cells, minlength=self.counts.size).reshape(
+            self.counts.shape
+        )
+        self.keys = keys
+
+    def keep_months(self, months):
+        """Drop every month that isn't in a list
+
+        :param months: The months to keep in the format yyyy-mm
+        :type months: list
+        """
+        keep = self.months.isin(months)
+        self.months = self.months[keep]
+        self.counts = self.counts[:, keep]
+
+    def select(self, selection=None):
+        """Find the combinations that match a selection
+
+        :param selection: The labels to keep along each dimension, for instance
+            `{"Type": ["Supermarket"]}`. Dimensions that aren't given are not
+            filtered
+        :type selection: dict, optional
+
+        :return: True for every row that matches
+        :rtype: numpy.ndarray
+        """
+        mask = np.ones(len(self.keys), dtype=bool)
+
+        for dimension, labels in (selection or {}).items():
+            codes = self.labels[dimension].get_indexer(pd.Index(labels, dtype=object))
+            mask &= np.isin(self.keys[:, dimensions.index(dimension)], codes)
+
+        return mask
+
+    def month_columns(self, months=None):
+        """Find the columns of a list of months
+
+        :param months: The months in the format yyyy-mm, if this is None every
+            month is used
+        :type months: list, optional
+
+        :return: True for every column to use
+        :rtype: numpy.ndarray
+        """
+        if months is None:
+            return np.ones(len(self.months), dtype=bool)
+        return self.months.isin(months)
+
+    def trend(self, selection=None):
+        """Count the crimes in each month
+
+        :param selection: The labels to keep along each dimension
+        :type selection: dict, optional
+
+        :return: The number of crimes matching the selection in each month
+        :rtype: pandas.Series
+        """
+        counts = self.counts[self.select(selection)].sum(axis=0)
+        return pd.Series(counts, index=self.months, name="crimes")
+
+    def totals(self, by, selection=None, months=None, top=None):
+        """Count the crimes in each combination of some of the dimensions
+
+        :param by: The dimensions to count over, the others are summed
+        :type by: list
+        :param selection: The labels to keep along each dimension
+        :type selection: dict, optional
+        :param months: The months to count, if this is None every month is used
+        :type months: list, optional
+        :param top: How many combinations to return, if this is None every
+            combination with crimes is returned
+        :type top: int, optional
+
+        :return: A column with the label of each dimension in by and the number
+            of `crimes`, from the most crimes to the least
+        :rtype: pandas.DataFrame
+        """
+        rows = self.select(selection)
+        counts = self.counts[rows][:, self.month_columns(months)].sum(axis=1)
+
+        groups, inverse = self.group(by, rows)
+        totals = np.bincount(inverse, weights=counts, minlength=len(groups))
+        totals = totals.astype(np.int64)
+
+        # Put the groups in order of their counts, only the top ones have to be
+        # sorted fully
+        order = np.flatnonzero(totals > 0)
+        if top is not None and top < len(order):
+            order = order[np.argpartition(-totals[order], top - 1)[:top]]
+        order = order[np.argsort(-totals[order], kind="stable")]
+
+        result = self.group_labels(by, groups[order])
+        result["crimes"] = totals[order]
+        return result
+
+    def series(self, by, selection=None, months=None):
+        """Count the crimes in each month for each combination of some of the
+        dimensions
+
+        :param by: The dimensions to count over, the others are summed
+        :type by: list
+        :param selection: The labels to keep along each dimension
+        :type selection: dict, optional
+        :param months: The months to count in the format yyyy-mm, months with
+            no crimes in the count are given a column of zeros. If this is None
+            every month from the first to the last month in the count is used
+        :type months: list, optional
+
+        :return: A dataframe with a column for the label of each dimension in by
+            and a row for each combination, and an array with the number of
+            crimes in each month for each combination with a row for each row of
+            the dataframe and a column for each month in the order they were
+            given
+        :rtype: tuple
+        """
+        if months is None:
+            months = []
+            if len(self.months) > 0:
+                months = month_range(self.months[0], self.months[-1])
+
+        # A month with no crimes picks the column of zeros added at the end
+        columns = self.months.get_indexer(pd.Index(months, dtype=object).astype(str))
+
+        rows = self.select(selection)
+        counts = np.pad(self.counts[rows], ((0, 0), (0, 1)))[:, columns]
+
+        groups, inverse = self.group(by, rows)
+
+        # Sort the rows by their group so each group can be summed as one slice
+        order = np.argsort(inverse, kind="stable")
+        starts = np.flatnonzero(np.diff(inverse[order], prepend=-1))
+
+        if len(order) == 0:
+            return self.group_labels(by, groups), counts
+        return self.group_labels(by, groups), np.add.reduceat(
+            counts[order], starts, axis=0
+        )
+
+    def group(self, by, rows):
+        """Find the distinct combinations of some of the dimensions in a set of
+        rows
+
+        :param by: The dimensions to combine
+        :type by: list
+        :param rows: True for every row to use
+        :type rows: numpy.ndarray
+
+        :return: The codes of each combination, and the combination each row is
+            in
+        :rtype: tuple
+        """
+        columns = [dimensions.index(dimension) for dimension in by]
+
+        # The codes are packed into one number so they can be sorted quickly
+        shape = tuple(len(self.labels[dimension]) for dimension in by)
+        packed = np.ravel_multi_index(self.keys[rows][:, columns].T, shape)
+        packed, inverse = np.unique(packed, return_inverse=True)
+
+        return np.column_stack(np.unravel_index(packed, shape)), inverse
+
+    def group_labels(self, by, groups):
+        """Look up the labels of a set of combinations
+
+        :param by: The dimensions that were combined
+        :type by: list
+        :param groups: The codes of each combination
+        :type groups: numpy.ndarray
+
+        :return: A column with the label of each dimension
+        :rtype: pandas.DataFrame
+        """
+        return pd.DataFrame(
+            {
+                dimension: self.labels[dimension][groups[:, i]]
+                for i, dimension in enumerate(by)
+            }
+        )
@@ -3,16 +3,11 @@ This module is used to download and analyse data from the data.police.uk API.
 """
 
 import pandas as pd
-from pandas import json_normalize
 
-from tqdm.auto import trange, tqdm
-
-import requests
-import json
+from tqdm.auto import tqdm
 
 import os
 import numpy as np
-from pathlib import Path
 
 from datetime import date, timedelta
 import dateutil
@@ -21,19 +16,56 @@ import seaborn as sns
 from matplotlib import pyplot as plt
 from textwrap import wrap
 
-from math import sqrt
 
+import shapely
+from shapely import get_parts, union_all
 from shapely.geometry import Polygon, box, MultiPolygon
 
 from crime_hotspots_uk.constants import (
     baseURL,
     crime_categories_url,
+    crime_dates_url,
+    hotspot_bandwidth,
+    hotspot_cell_size,
     ignore,
+    match_radius,
+    max_simplifications,
+    max_subdivisions,
+    max_url_length,
+    max_workers,
+    neighbour_distance,
+    neighbourhood_url,
+    published_ttl,
+    request_tolerance,
 )
+from crime_hotspots_uk.archives import read_archive
+from crime_hotspots_uk.cache import Cache
+from crime_hotspots_uk.cube import CountCube, month_range
+from crime_hotspots_uk.decoder import decode_response
+from crime_hotspots_uk.density import count_grid, grid_extent, smooth_grid
+from crime_hotspots_uk.downloader import Downloader
 from crime_hotspots_uk.locations.constituincy import Constituincy
+from crime_hotspots_uk.mappings import MappingStore
+from crime_hotspots_uk.metadata import Metadata
+from crime_hotspots_uk.schema import compact, concat
+from crime_hotspots_uk.session import Session
+from crime_hotspots_uk.significance import getis_ord, mann_kendall, p_values
+from crime_hotspots_uk.spatial import (
+    assign_areas,
+    from_metres,
+    nearest,
+    neighbour_weights,
+    shape_to_metres,
+    to_metres,
+)
 
 from pyreadstat import write_sav
 
+# The type of place each crime happened at, either `Street` for a descriptive
+# location or one of the non descriptive names in the ignore list. Storing the
+# type as a categorical means filtering on it only compares integer codes
+location_types = pd.CategoricalDtype(["Street"] + list(dict.fromkeys(ignore)))
+
 
 class Root:
     """This class handles all downloading and processing of the data."""
@@ -44,6 +76,10 @@ class Root:
         location_names,
         location_type=Constituincy,
         usage="crime",
+        workers=max_workers,
+        session=None,
+        offline=False,
+        fetch_all=False,
     ):
         """This function initiates the class
 
@@ -56,6 +92,25 @@ class Root:
             method, if search is passed it will use the `Stop and searches by
             area <https://data.police.uk/docs/method/stops-street/>`_ method.
         :type usage: string, optional
+        :param workers: How many requests can be sent to the API at the same time,
+            set this to 1 to download one month at a time
+        :type workers: int, optional
+        :param session: The HTTP session all requests to the API are sent
+            through. If none is passed a pooled session is created, pass one to
+            change the timeouts, transport or rate limit, or to share
+            connections and the rate limit between several objects
+        :type session: crime_hotspots_uk.session.Session, optional
+        :param offline: If this is True nothing is downloaded, the crime
+            categories, area boundaries and crime data are only loaded from the
+            cache. Otherwise the categories and boundaries are loaded from the
+            cache when it has a fresh copy and downloaded when it doesn't
+        :type offline: bool, optional
+        :param fetch_all: If this is True every crime type is split out of the
+            `all-crime` data locally, so the data only has to be downloaded and
+            cached once however many crime types are looked at. Otherwise only
+            the crime type asked for is downloaded, unless several are asked for
+            at once
+        :type fetch_all: bool, optional
 
         :raise AssertionError: This error is raised if the string passed to
             usage is not 'crime' or 'search'.
@@ -75,26 +130,64 @@ class Root:
         else:
             assert False, 'usage argument should be either "crime" or "search"'
 
-        self.locations = location_type(location_names, name)
+        self.offline = offline
+        self.fetch_all = fetch_all
+
+        self.locations = location_type(location_names, name, offline=offline)
         temp = self.locations.locations["shapes"].apply(self.fix_polygons)
         self.locations.locations["shapes"] = temp
         self.locations.locations.reset_index(drop=True, inplace=True)
 
+        # Create the handler for the on disk cache of downloaded data
+        self.cache = Cache(self.locations.__name__, self.usage)
+
+        # The mappings don't depend on the usage so crime and stop and search
+        # data share them
+        self.mapping_store = MappingStore(self.locations.__name__)
+
+        # Create the session that keeps connections to the API open and the
+        # downloader that sends all the requests through it while keeping to
+        # the rate limits
+        if session is None:
+            session = Session(pool_size=workers)
+        self.session = session
+        self.downloader = Downloader(session, workers)
+
         # Update the local list of potential crime types by pulling from
-        # https://data.police.uk/docs/method/crime-categories/
-        url = crime_categories_url
-        payload = {}
-        files = {}
-        headers = {}
-        response = requests.request(
-            "GET", url, headers=headers, data=payload, files=files
+        # https://data.police.uk/docs/method/crime-categories/ unless there is
+        # a fresh copy in the cache
+        categories = Metadata(offline=offline).load_json(
+            "crime-categories", self.download_crime_categories
         )
 
         # Create a dictionary of the possible crime types and their names
         self.crime_types = {}
-        for i in response.json():
+        for i in categories:
             self.crime_types[i["name"]] = i["url"]
 
+        # The months the API has published data for and the forces each area
+        # is policed by keyed by its name, these are only downloaded when they
+        # are first needed
+        self.published = None
+        self.forces = {}
+
+        # The count of the crimes in each area, category, location and month,
+        # this is only built when it is first needed
+        self.cube = None
+
+    def download_crime_categories(self):
+        """Download the list of crime categories from the API
+
+        :return: The categories, each with a `name` and a `url`
+        :rtype: list
+        """
+        response = self.downloader.get(crime_categories_url)
+
+        if response.status_code != 200:
+            raise http_error_code(response.status_code, crime_categories_url)
+
+        return response.json()
+
     def get_data(self, crime_type):
         """Download data for a specified crime type.
 
@@ -105,7 +198,9 @@ class Root:
             one of the types listed in self.crime_types, it should be the
             readable name (without any -/_) The full explanation of what each
             category is can be infered from the `Police website <https://www.police.uk/pu/contact-the-police/what-and-how-to-report/what-report/>_` # noqa e501
-        :type crime_type: string, required
+            A list of crime types can also be passed, the `all-crime` data is
+            then downloaded once and split into the crime types locally
+        :type crime_type: string or list, required
 
         :return: Will return true if it managed to successfully download and
             validate the data. If it fails to it will return false.
@@ -114,41 +209,473 @@ class Root:
 
         # Check if the crime type is valide then set the crime type to a member
         # variable so it can later be used to anotate graphs
-        assert crime_type in self.crime_types.keys()
+        self.check_crime_type(crime_type)
         self.crime_type = crime_type
 
-        # Create a list to hold all the crime data once its downloaded
-        crimes = []
+        months = self.get_months()
 
-        # Loop through all the areas
-        for area in tqdm(self.locations.locations.index, desc="Areas"):
-            for polygon in tqdm(
-                self.locations.locations["shapes"].iloc[area],
-                desc="Polygons",
-                leave=False,
-            ):
-                # Get the crimes for the current Area
-                temp = self.get_crimes(
-                    polygon.exterior.coords,
-                    self.locations.locations["Name"][area],
-                )
+        # Get the crimes for all the areas at once so neighbouring areas can
+        # share requests
+        crimes = self.get_areas(
+            {area: months for area in self.locations.locations.index}
+        )
 
-                # If the data that is retrieved is a dataframe then append it
-                # to the list of crime dataframes
-                if isinstance(temp, pd.DataFrame):
-                    crimes.append(temp)
-                else:
-                    print("No incidents found")
+        self.cache.save()
 
         # Convert the list of crime dataframes to one big dataframe
-        self.all_crimes = pd.concat(crimes)
+        self.all_crimes = concat(crimes)
+        self.cube = None
 
         # If you have reached here the function was executed successfully
         return True
 
-    def get_crimes(self, coords, name):
+    def update_data(self):
+        """Bring the data loaded by get_data up to date
+
+        Instead of downloading the whole window again only the months that have
+        been added since the data for each area was last downloaded are
+        fetched, and months that have left the window are dropped. If the
+        locations have already been fixed they are fixed again, the new crimes
+        can change the mappings of the old ones.
+
+        :return: The number of crimes that were added
+        :rtype: int
+        """
+        months = self.get_months()
+        category = self.cache_category()
+
+        # Drop the months that have left the window
+        in_window = self.row_months(self.all_crimes).isin(months)
+        self.all_crimes = self.all_crimes[in_window.values]
+        if self.cube is not None:
+            self.cube.keep_months(months)
+
+        area_months = {}
+        for area in self.locations.locations.index:
+            name = self.locations.locations["Name"][area]
+
+            # Only get the months after the high-water mark for the area
+            mark = self.cache.mark(name, category)
+            new_months = [month for month in months if mark is None or month > mark]
+
+            if len(new_months) > 0:
+                area_months[area] = new_months
+
+        crimes = self.get_areas(area_months)
+
+        self.cache.save()
+
+        if len(crimes) == 0:
+            return 0
+
+        # Add the new crimes to the end so the existing rows keep their places
+        start = self.all_crimes.shape[0]
+        self.all_crimes = concat([self.all_crimes] + crimes)
+
+        # The new crimes add locales, which can change the mappings of crimes
+        # that were already fixed, so every row is fixed again. Fixing a row
+        # twice is harmless and drops the cube if any old row was changed
+        if hasattr(self, "global_locales"):
+            self.fix_locations()
+
+        # Count the new crimes into the cube rather than building it again
+        if self.cube is not None:
+            new_crimes = self.all_crimes.iloc[start:]
+            self.cube.add(new_crimes, self.row_months(new_crimes))
+
+        return self.all_crimes.shape[0] - start
+
+    def get_areas(self, area_months, locations=None):
+        """Get the crimes for a set of areas
+
+        Months that are in the cache are read from it. The rest are downloaded
+        for all the areas that need them at once, neighbouring areas are merged
+        into as few request boundaries as possible so their shared borders are
+        only requested once. Each crime that comes back is then given to the
+        areas it falls inside using a spatial index.
+
+        :param area_months: The months to get in the format yyyy-mm for each
+            area, keyed by the index of the area in locations
+        :type area_months: dict
+        :param locations: The areas with their `Name` and `shapes`, if this is
+            None self.locations.locations is used
+        :type locations: pandas.DataFrame, optional
+
+        :return: A dataframe of crimes for each area that had any
+        :rtype: list
+        """
+        if locations is None:
+            locations = self.locations.locations
+        category = self.cache_category()
+
+        wanted = {}
+        unknown = {}
+        imported = {}
+
+        for area, months in tqdm(area_months.items(), desc="Areas", leave=False):
+            name = locations["Name"][area]
+
+            # Police data is published a few months late, skip the months that
+            # haven't been published yet as they would always come back empty.
+            # When offline this can't be checked so every cached month is used
+            if not self.offline:
+                published = self.published_months(name, locations["shapes"][area])
+                months = [month for month in months if month in published]
+                if len(months) == 0:
+                    continue
+
+            wanted[area] = months
+
+            # Read all the cached months for the area in one go, the months
+            # that aren't in the cache are the only ones downloaded
+            imported[area], unknown[area] = self.cache.read_months(
+                name, category, months
+            )
+
+        # Group the areas by the months they are missing so every group can be
+        # downloaded together. When offline the missing months are skipped
+        groups = {}
+        if not self.offline:
+            for month in sorted({month for m in unknown.values() for month in m}):
+                areas = tuple(area for area in unknown if month in unknown[area])
+                groups.setdefault(areas, []).append(month)
+
+        downloaded = {area: [] for area in wanted}
+
+        # The ids of the crimes already kept for each area, crimes that come
+        # back for more than one request are dropped as soon as they arrive
+        seen = {area: set() for area in wanted}
+        for areas, months in groups.items():
+            shapes = [locations["shapes"][area] for area in areas]
+
+            for region in tqdm(self.plan_requests(shapes), desc="Regions", leave=False):
+                found = self.download_months(region, months)
+                frames = [frame for frame in found.values() if frame.shape[0] > 0]
+                if len(frames) == 0:
+                    continue
+                crimes = pd.concat(frames, ignore_index=True)
+
+                # Give each crime to every area in the group it falls inside,
+                # the request boundary covers more than the areas so some
+                # crimes aren't inside any of them and are dropped
+                point_index, area_index = assign_areas(
+                    crimes["location.latitude"], crimes["location.longitude"], shapes
+                )
+                for i, area in enumerate(areas):
+                    rows = point_index[area_index == i]
+                    if len(rows) > 0:
+                        new = self.drop_seen(crimes.iloc[rows], seen[area])
+                        downloaded[area].append(new)
+
+        results = []
+        for area, months in wanted.items():
+            name = locations["Name"][area]
+
+            # Crimes near the edge of a split request boundary can come back
+            # for more than one part of it, keep each one once
+            crimes = self.merge_parts(downloaded[area])
+
+            if not self.offline:
+                # Remember the months that had no data so they aren't
+                # requested again
+                found = (
+                    set(self.month_strings(crimes)) if crimes.shape[0] > 0 else set()
+                )
+                for month in unknown[area]:
+                    if month not in found:
+                        self.cache.record_empty(name, category, month)
+
+                # Everything up to the last month has now been downloaded
+                self.cache.set_mark(name, category, max(months))
+
+            if imported.get(area) is not None and imported[area].shape[0] > 0:
+                crimes = pd.concat([crimes, self.drop_seen(imported[area], seen[area])])
+
+            if crimes.shape[0] > 0:
+                crimes = self.format_crimes(crimes, name)
+
+            # The all crime data is split up below so it would never be
+            # written to the cache whole, save the months that were downloaded
+            # now so they can be used for any crime type
+            if self.split_locally() and not self.offline and crimes.shape[0] > 0:
+                row_months = self.row_months(crimes)
+                for month in unknown[area]:
+                    self.cache.write(
+                        crimes[(row_months == month).to_numpy()],
+                        name,
+                        category,
+                        month,
+                    )
+
+            if self.split_locally() and crimes.shape[0] > 0:
+                crimes = crimes[crimes["category"].isin(self.wanted_categories())]
+
+            if crimes.shape[0] > 0:
+                results.append(crimes)
+            else:
+                print("No incidents found")
+
+        return results
+
+    def plan_requests(self, shapes):
+        """Work out which boundaries to request to cover a set of areas
+
+        The areas are merged so neighbouring areas become one boundary, then
+        each boundary is simplified until it fits in a single request. The
+        boundaries can cover a little more than the areas, so the crimes that
+        come back have to be clipped to the areas afterwards.
+
+        :param shapes: The boundaries of the areas
+        :type shapes: list
+
+        :return: The polygons to request the crimes for
+        :rtype: list
+        """
+        merged = union_all(shapes)
+
+        # The API only uses the outside edge of each boundary, so holes in the
+        # merged areas are filled in
+        regions = [
+            Polygon(part.exterior)
+            for part in get_parts(merged)
+            if isinstance(part, Polygon) and not part.is_empty
+        ]
+
+        # An area that sits in a hole of another one is already covered once
+        # the hole is filled in
+        regions = [
+            region
+            for i, region in enumerate(regions)
+            if not any(
+                i != j and other.covers(region) for j, other in enumerate(regions)
+            )
+        ]
+
+        return [self.simplify_region(region) for region in regions]
+
+    def simplify_region(self, region):
+        """Reduce the number of points in a boundary so it fits in one request
+
+        The boundary is pushed outwards before it is simplified so the
+        simplified boundary still covers all of the original one. If it can't be
+        made short enough the original boundary is returned and it is split up
+        when it is downloaded.
+
+        :param region: The boundary to simplify
+        :type region: shapely.geometry.Polygon
+
+        :return: A boundary that covers the original one
+        :rtype: shapely.geometry.Polygon
+        """
+        tolerance = request_tolerance
+        simplified = region
+
+        for _ in range(max_simplifications):
+            location = self.location_string(simplified.exterior.coords)
+            if len(self.url_gen(location, "yyyy-mm")) <= max_url_length:
+                return simplified
+
+            candidate = region.buffer(2 * tolerance, join_style="mitre").simplify(
+                tolerance
+            )
+            if isinstance(candidate, Polygon) and candidate.covers(region):
+                simplified = candidate
+
+            tolerance *= 2
+
+        return region
+
+    def get_archive_data(self, archives, crime_type, forces=None):
+        """Load data for a specified crime type from downloaded archives.
+
+        This does the same job as get_data but instead of sending requests to
+        the API it reads the monthly archives that can be downloaded from
+        `data.police.uk <https://data.police.uk/data/>`_. This is much faster
+        when the areas are large. The archives are read without unpacking them
+        and only the crimes inside the areas are kept.
+
+        :param archives: The paths of the zip files to read
+        :type archives: list
+        :param crime_type: The crime type to load the data for. It must be one
+            of the types listed in self.crime_types, or a list of them
+        :type crime_type: string or list
+        :param forces: The forces to read the data for, using the names in the
+            archive file names such as `west-yorkshire`. If this is None the
+            data for every force in the archives is read
+        :type forces: list, optional
+
+        :return: Will return true if it managed to load the data.
+        :rtype: bool
+        """
+
+        # Check if the crime type is valide then set the crime type to a member
+        # variable so it can later be used to anotate graphs
+        self.check_crime_type(crime_type)
+        self.crime_type = crime_type
+
+        # The archives use the readable names for the crime types, work out
+        # which ones to keep and what to rename them to so the category column
+        # matches the data from the API
+        if self.usage != "crimes-street":
+            categories = None
+        elif self.wanted_categories() is None:
+            categories = self.crime_types
+        else:
+            categories = {
+                name: category
+                for name, category in self.crime_types.items()
+                if category in self.wanted_categories()
+            }
+
+        shapes = self.locations.locations["shapes"].tolist()
+        names = self.locations.locations["Name"].tolist()
+
+        # The files already read, the archives for different months overlap so
+        # the same file can be in more than one
+        seen = set()
+
+        found = []
+        for archive in tqdm(archives, desc="Archives"):
+            temp = read_archive(
+                archive,
+                self.usage,
+                shapes,
+                names,
+                months=self.get_months(),
+                forces=forces,
+                categories=categories,
+                seen=seen,
+            )
+
+            if temp is not None:
+                found.append(temp)
+
+        assert len(found) > 0, "No incidents found in the archives"
+        found = pd.concat(found, ignore_index=True)
+
+        # Format the crimes for each area the same way the API data is
+        crimes = []
+        for name in names:
+            area_crimes = found[found["area name"] == name]
+            if area_crimes.shape[0] > 0:
+                crimes.append(self.format_crimes(area_crimes.copy(), name))
+            else:
+                print("No incidents found")
+
+        # Convert the list of crime dataframes to one big dataframe
+        self.all_crimes = concat(crimes)
+        self.cube = None
+
+        return True
+
+    def published_months(self, name, shape):
+        """Get the months the API has published data for in an area
+
+        The list of published months is downloaded from the `crimes-street-dates
+        <https://data.police.uk/docs/method/crimes-street-dates/>`_ method the
+        first time it is needed and then reused, it is cached on disk for a day
+        so warm runs don't have to download it again. Stop and search data is
+        only published by some forces in some months, so for stop and searches
+        only the months published by a force that polices the area are returned.
+
+        :param name: The name of the area
+        :type name: string
+        :param shape: The boundary of the area
+        :type shape: shapely.geometry.MultiPolygon
+
+        :return: The published months in the format yyyy-mm
+        :rtype: set
+        """
+        if self.published is None:
+            dates = Metadata(ttl=published_ttl, offline=self.offline).load_json(
+                "crimes-street-dates", self.download_published_months
+            )
+
+            self.published = {}
+            for entry in dates:
+                self.published[entry["date"]] = set(entry["stop-and-search"])
+
+        if self.usage == "crimes-street":
+            return set(self.published.keys())
+
+        forces = self.area_forces(name, shape)
+        return {
+            month
+            for month, published_forces in self.published.items()
+            if len(forces & published_forces) > 0
+        }
+
+    def download_published_months(self):
+        """Download the list of published months from the API
+
+        :return: The months, each with a `date` and the `stop-and-search`
+            forces that published stop and searches for it
+        :rtype: list
+        """
+        response = self.downloader.get(crime_dates_url)
+
+        if response.status_code != 200:
+            raise http_error_code(response.status_code, crime_dates_url)
+
+        return response.json()
+
+    def area_forces(self, name, shape):
+        """Get the forces that police an area
+
+        The force is looked up for a point inside each polygon of the area using
+        the `locate-neighbourhood
+        <https://data.police.uk/docs/method/neighbourhood-locate/>`_ method. The
+        forces are cached on disk with the rest of the metadata.
+
+        :param name: The name of the area
+        :type name: string
+        :param shape: The boundary of the area
+        :type shape: shapely.geometry.MultiPolygon
+
+        :return: The ids of the forces, for instance `west-yorkshire`
+        :rtype: set
+        """
+        if name not in self.forces:
+            path = "forces/" + self.locations.__name__ + "/" + str(name)
+            forces = Metadata(offline=self.offline).load_json(
+                path, lambda: self.download_forces(shape)
+            )
+            self.forces[name] = set(forces)
+
+        return self.forces[name]
+
+    def download_forces(self, shape):
+        """Download the forces that police an area
+
+        :param shape: The boundary of the area
+        :type shape: shapely.geometry.MultiPolygon
+
+        :return: The ids of the forces
+        :rtype: list
+        """
+        points = [polygon.representative_point() for polygon in shape.geoms]
+        urls = [
+            neighbourhood_url + str(point.y) + "," + str(point.x) for point in points
+        ]
+
+        forces = set()
+        for url, response in zip(urls, self.downloader.get_all(urls, "Forces")):
+            # Points that aren't policed by any force (for instance in the sea)
+            # come back as 404s and are skipped
+            if response.status_code == 200:
+                forces.add(response.json()["force"])
+            elif response.status_code != 404:
+                raise http_error_code(response.status_code, url)
+
+        return sorted(forces)
+
+    def get_crimes(self, coords, name, months=None):
         """Download all crimes of a specific type within a boundary
 
+        The boundary is treated like one of the areas in self.locations, so
+        the crimes come from the cache where they can and are filtered in the
+        same way.
+
         :param coords: A two deep list containing latitude and longitude
             coordinate pairs
         :type coords: list
@@ -156,123 +683,354 @@ class Root:
             name will be appended as a column to the output dataframe to ensure
             that each area can be selected individualy
         :type coords: string
+        :param months: The months to get the crimes for in the format yyyy-mm,
+            if this is None every month in the window is used
+        :type months: list, optional
 
         :return: Returns either a pandas dataframe if the data retireval was
             successfull or NONE if it wasn't
         :rtype: pandas.dataframe
         """
+        locations = pd.DataFrame(
+            {"Name": [name], "shapes": [MultiPolygon([Polygon(coords)])]}
+        )
 
-        # Create an empty string that will be used to send the coordinates in
-        # the API request
-        location = ""
+        if months is None:
+            months = self.get_months()
 
-        # Loop through all the coordinate pairs
-        for i in range(0, len(coords)):
-            # Add each coordinate pair to the API request string
-            temp = str(coords[i][1])[0:9] + "," + str(coords[i][0])[0:9] + ":"
-            location = location + temp
+        crimes = self.get_areas({0: months}, locations)
 
-        # Remove the traling `:` from the request
-        location = location[:-1]
+        # Return NONE if no data was found
+        if len(crimes) == 0:
+            return
 
-        # Set the start and end date fo the request
-        end_date = date.today() - dateutil.relativedelta.relativedelta(months=1)
-        start_date = end_date - dateutil.relativedelta.relativedelta(months=37)
+        return crimes[0]
 
-        # Create a list of dates that can be added to the API request
-        dates = (
-            pd.date_range(start_date, end_date - timedelta(days=1), freq="MS")
-            .strftime("%Y-%m")
-            .tolist()
+    def download_months(self, polygon, months, depth=0):
+        """Download the crimes within a boundary for a list of months
+
+        If the API can't return the data for the whole boundary, either because
+        there were more than 10,000 crimes in a month (response code 503) or
+        because the boundary has so many points the URL is too long, the
+        boundary is split into quarters and each quarter is downloaded
+        separately. This is repeated until every request succeeds.
+
+        :param polygon: The boundary to download the crimes for
+        :type polygon: shapely.geometry.Polygon
+        :param months: The months to download in the format yyyy-mm
+        :type months: list
+        :param depth: How many times the boundary has already been split
+        :type depth: int, optional
+
+        :raise http_error_code: This error is raised if the API returns an
+            error that can't be fixed by splitting the boundary, or if the
+            boundary has been split `max_subdivisions` times without success
+
+        :return: A dictionary with a dataframe of the crimes for each month
+        :rtype: dict
+        """
+        location = self.location_string(polygon.exterior.coords)
+
+        # Generate the URLs to be sent by using the URL gen function
+        urls = [self.url_gen(location, current_date) for current_date in months]
+
+        found = {}
+        too_big = []
+
+        # The police API only accepts requests shorter than 4096 characters,
+        # all the URLs are the same length as only the month changes
+        if len(urls) > 0 and len(urls[0]) > max_url_length:
+            too_big = list(months)
+        else:
+            # Send the requests concurrently, the responses come back in the
+            # same order as the months they were requested for
+            responses = self.downloader.get_all(urls)
+
+            for current_date, url, response in zip(months, urls, responses):
+                # Check to see if the response code was correct (200), a 503
+                # means the area needs splitting, anything else is an error
+                if response.status_code == 200:
+                    found[current_date] = decode_response(response.text, self.usage)
+                elif response.status_code == 503:
+                    too_big.append(current_date)
+                else:
+                    raise http_error_code(response.status_code, url)
+
+        if len(too_big) > 0:
+            if depth >= max_subdivisions:
+                url = urls[months.index(too_big[0])]
+                if len(url) > max_url_length:
+                    raise http_error_code(414, url)
+                raise http_error_code(503, url)
+
+            # Download each quarter of the boundary for the months that failed
+            parts = [
+                self.download_months(part, too_big, depth + 1)
+                for part in self.split_polygon(polygon)
+            ]
+
+            for current_date in too_big:
+                found[current_date] = self.merge_parts(
+                    [part[current_date] for part in parts]
+                )
+
+        return found
+
+    def split_polygon(self, polygon):
+        """Split a polygon into quarters
+
+        :param polygon: The polygon to split
+        :type polygon: shapely.geometry.Polygon
+
+        :return: The polygons that make up each quarter, a quarter can be made
+            of several polygons or none at all depending on the shape
+        :rtype: list
+        """
+        xmin, ymin, xmax, ymax = polygon.bounds
+        xmid = (xmin + xmax) / 2
+        ymid = (ymin + ymax) / 2
+
+        quarters = [
+            box(xmin, ymin, xmid, ymid),
+            box(xmid, ymin, xmax, ymid),
+            box(xmin, ymid, xmid, ymax),
+            box(xmid, ymid, xmax, ymax),
+        ]
+
+        parts = []
+        for quarter in quarters:
+            # The intersection can be a mix of polygons, lines and points, only
+            # the polygons cover an area that can contain crimes
+            for part in get_parts(polygon.intersection(quarter)):
+                if isinstance(part, Polygon) and not part.is_empty:
+                    parts.append(part)
+
+        return parts
+
+    def merge_parts(self, parts):
+        """Merge the crimes downloaded for the parts of a split boundary
+
+        Crimes on the edge between two parts can be returned for both of them,
+        so the merged data is de-duplicated. Crimes are matched on their id,
+        stop and searches don't have an id so rows that are identical in every
+        column are only kept from the first part they were returned for.
+
+        :param parts: The crimes for each part
+        :type parts: list
+
+        :return: The crimes for the whole boundary
+        :rtype: pandas.DataFrame
+        """
+        parts = [part for part in parts if part.shape[0] > 0]
+
+        if len(parts) == 0:
+            return pd.DataFrame()
+
+        merged = pd.concat(parts, ignore_index=True)
+
+        if "id" in merged.columns:
+            return merged.drop_duplicates(subset="id", ignore_index=True)
+
+        # Label each row with the part it came from and find the first part
+        # each distinct row appears in
+        keys = pd.util.hash_pandas_object(merged.astype(str), index=False)
+        part_number = pd.Series(
+            np.repeat(np.arange(len(parts)), [part.shape[0] for part in parts])
         )
+        first_part = part_number.groupby(keys.values).transform("min")
+
+        return merged[part_number == first_part].reset_index(drop=True)
+
+    def drop_seen(self, crimes, seen):
+        """Remove the crimes that have already been kept
+
+        Crimes are matched on their `id`, or on their `persistent_id` if they
+        don't have one (like the crimes read from the archives). Crimes with a
+        missing or blank id and stop and searches, which have no id at all, are
+        always kept.
+
+        :param crimes: The crimes to check
+        :type crimes: pandas.DataFrame
+        :param seen: The ids of the crimes that have already been kept, the ids
+            of the crimes that are returned are added to it
+        :type seen: set
+
+        :return: The crimes that haven't been seen before
+        :rtype: pandas.DataFrame
+        """
+        if "id" in crimes.columns:
+            ids = crimes["id"]
+        elif "persistent_id" in crimes.columns:
+            ids = crimes["persistent_id"]
+        else:
+            return crimes
+
+        # Anti-social behaviour has no persistent id so blank ids can't be used
+        # to tell crimes apart
+        has_id = (ids.notna() & (ids.astype(str) != "")).to_numpy()
 
-        # Create an empty list to hold the returned JSONS of the crime data
-        crime_jsons = []
-        imports = []
+        new = ~ids.isin(seen).to_numpy() & ~ids.duplicated().to_numpy()
+        keep = new | ~has_id
 
-        # Loop through the list of dates
-        for current_date in tqdm(dates, leave=False, desc="Months"):
+        seen.update(ids[new & has_id])
 
-            imported = self.import_cache(
-                self.locations.__name__,
-                name,
-                current_date,
-                self.crime_types[self.crime_type],
+        if keep.all():
+            return crimes
+        return crimes[keep]
+
+    def format_crimes(self, crimes, name):
+        """Format the raw crime data for an area so it can be analysed
+
+        :param crimes: The crimes for the area, with the same columns as the
+            flattened JSON returned by the API
+        :type crimes: pandas.DataFrame
+        :param name: The name of the area the crimes are in
+        :type name: string
+
+        :return: The formatted crimes
+        :rtype: pandas.DataFrame
+        """
+
+        # The pretty name is worked out when it is needed rather than stored,
+        # data cached by older versions still has it
+        if "pretty name" in crimes.columns:
+            del crimes["pretty name"]
+
+        # Add a column with the name of the area that the data is from
+        crimes["area name"] = str(name)
+
+        # Reset the index to number all entries from 0 to length of the data
+        crimes.reset_index(inplace=True, drop=True)
+
+        crimes["location.street.name"] = crimes["location.street.name"].str.replace(
+            "On or near ", ""
+        )
+
+        # Work out the type of each location once here so everything after can
+        # filter on the codes instead of matching the names. Rows read back
+        # from the cache already have a type, it is kept as their street name
+        # may have been fixed
+        if "Type" in crimes.columns:
+            types = pd.Categorical(crimes["Type"].astype(object), dtype=location_types)
+        else:
+            types = pd.Categorical.from_codes(
+                np.full(crimes.shape[0], -1), dtype=location_types
+            )
+
+        new = types.isna()
+        if new.any():
+            types[new] = self.classify_locations(
+                crimes.loc[new, "location.street.name"]
             )
+        crimes["Type"] = types
 
-            if imported is None:
-                # Generate the URL to be sent by using the URL gen function
-                url = self.url_gen(location, current_date)
+        # Store the coordinates as numbers and the columns with few distinct
+        # values as categoricals
+        compact(crimes)
 
-                # No payload or headers are required for the request
-                payload = {}
-                headers = {}
+        # Return the dataframe of crimes
+        return crimes
 
-                # The police API only accepts requests shorter than 4096 characters
-                if len(url) > 4094:
-                    print("url too long")
-                    return
+    def pretty_names(self, crimes=None):
+        """Get an easily readable name for the location of each crime
 
-                # Send the request and save the response
-                response = requests.request("GET", url, headers=headers, data=payload)
+        Descriptive locations are named like `On or near Hyde Park Place - Leeds
+        North West`. Once the locations have been fixed non descriptive ones are
+        named like `Supermarket - Hyde Park Place - Leeds North West`. The names
+        are only built once for each distinct location and shared between the
+        rows, so they take up very little memory.
 
-                # Check to see if the response code was correct (200), if it wasn't
-                # print out a warning message and return NONE
-                if response.status_code != 200:
-                    raise http_error_code(response.status_code)
-                else:
-                    # If the response code was 200 add the JSON ro the list of data
-                    crime_jsons.append(json_normalize(json.loads(response.text)))
+        :param crimes: The crimes to name, if this is None self.all_crimes is
+            used
+        :type crimes: pandas.DataFrame, optional
+
+        :return: The name of each crime's location
+        :rtype: pandas.Series
+        """
+        if crimes is None:
+            crimes = self.all_crimes
+
+        columns = [
+            crimes[column].astype("category")
+            for column in ["Type", "location.street.name", "area name"]
+        ]
+
+        # Find the distinct locations from the category codes and which one
+        # each row is at
+        codes = np.column_stack([column.cat.codes.to_numpy() for column in columns])
+        locations, inverse = np.unique(codes, axis=0, return_inverse=True)
+
+        names = []
+        for location in locations:
+            location_type, street, area = [
+                column.cat.categories[code] if code >= 0 else None
+                for column, code in zip(columns, location)
+            ]
+
+            # A fixed location has the new street name but keeps its type
+            if location_type != "Street" and street != location_type:
+                names.append(
+                    str(location_type) + " - " + str(street) + " - " + str(area)
+                )
             else:
-                imports.append(imported)
+                names.append("On or near " + str(street) + " - " + str(area))
+
+        # Two locations could end up with the same name so the names are made
+        # distinct before they are used as the categories
+        categories, name_codes = np.unique(names, return_inverse=True)
+
+        return pd.Series(
+            pd.Categorical.from_codes(
+                name_codes[inverse.reshape(-1)], categories=categories
+            ),
+            index=crimes.index,
+            name="pretty name",
+        )
 
-        # Convert the list of data to a dataframe
-        if len(crime_jsons) > 0:
-            crimes_downloaded = pd.concat(crime_jsons)
-        else:
-            crimes_downloaded = None
+    def classify_locations(self, streets):
+        """Work out the type of place a set of locations are
 
-        if len(imports) > 0:
-            crimes_imported = pd.concat(imports)
-        else:
-            crimes_imported = None
+        Each name is looked up in a hash table of the names in the ignore list,
+        so unlike a regular expression the characters in the names have no
+        special meaning and only exact matches count.
 
-        if crimes_downloaded is None and crimes_imported is None:
-            return
-        elif crimes_downloaded is None and crimes_imported is not None:
-            crimes = crimes_imported
-        elif crimes_downloaded is not None and crimes_imported is None:
-            crimes = crimes_downloaded
-        else:
-            crimes = pd.concat([crimes_downloaded, crimes_imported])
+        :param streets: The street names with `On or near` removed
+        :type streets: pandas.Series
 
-        # If data was found ensure the dataframe is formatted correctly, if not
-        # return NONE
-        if crimes.shape[0] > 0:
-            # Set the latitude and longitude to numeric values
-            crimes["location.latitude"] = pd.to_numeric(crimes["location.latitude"])
-            crimes["location.longitude"] = pd.to_numeric(crimes["location.longitude"])
+        :return: The name from the ignore list for non descriptive locations and
+            `Street` for every other location
+        :rtype: pandas.Categorical
+        """
+        codes = location_types.categories.get_indexer(streets.astype(object))
 
-            # Create a pretty name that is easily readable
-            # Example: `On or near Hyde Park Place - Leeds North West`
-            crimes["pretty name"] = crimes["location.street.name"] + " - " + str(name)
+        # Names that aren't in the ignore list, including missing names, are
+        # descriptive
+        codes[codes < 0] = 0
 
-            # Add a column with the name of the area that the data is from
-            crimes["area name"] = str(name)
-            crimes["Type"] = "Street"
+        return pd.Categorical.from_codes(codes, dtype=location_types)
 
-            # Reset the index to number all entries from 0 to length of the data
-            crimes.reset_index(inplace=True, drop=True)
+    def unfixed_streets(self, crimes):
+        """Get the street names the police gave a set of crimes
 
-            crimes["location.street.name"] = crimes["location.street.name"].str.replace(
-                "On or near ", ""
-            )
+        Once a location has been fixed its street name is the new name, but the
+        type still holds the non descriptive name it was given, so the name is
+        taken from there.
 
-            # Return the dataframe of crimes
-            return crimes
+        :param crimes: The crimes
+        :type crimes: pandas.DataFrame
 
-        # Return NONE if no data was found
-        return
+        :return: The street name of each crime from before the locations were
+            fixed
+        :rtype: pandas.Series
+        """
+        types = crimes["Type"]
+        fixed = types.cat.codes.to_numpy() != 0
+
+        return (
+            crimes["location.street.name"]
+            .astype(object)
+            .where(~fixed, types.astype(object))
+        )
 
     def fix_locations(self):
         """Fix locations in the self.all_crimes dataframe
@@ -281,7 +1039,8 @@ class Root:
         used for multiple locations. For instance `On or near bus stop` doesn't
         tell us which bus stop it was near. This function takes the provided
         latitude and longitude coordinates and identifies which locale with a
-        definitive name in the local area is closest.
+        definitive name in the local area is closest. Rows that were fixed
+        before are fixed again with the current mappings.
 
         :raise AssertionError: This error is raised if a location name can't be
              correctly mapped to a street because there was no points close
@@ -292,25 +1051,19 @@ class Root:
         self.create_mappings()
 
         # Create a global list of all possible locations in the UK, this
-        # contains the street name, latitude, longitude, area name and a
-        # pretty name made up of the street name and area. Note that
-        # one street can appear in two areas
+        # contains the street name, latitude, longitude and area name. Note
+        # that one street can appear in two areas
         self.global_locales = self.all_crimes[
             [
                 "location.street.name",
                 "location.latitude",
                 "location.longitude",
                 "area name",
-                "pretty name",
             ]
         ]
 
-        # Create a search term to compare each entry agains, the search term
-        # is formed from the known non desriptive values in the ignore constant
-        search = "|".join(ignore)
-
         # Create a truth table mask of which locations names are descriptive
-        mask = ~self.global_locales["location.street.name"].str.contains(search)
+        mask = self.all_crimes["Type"].cat.codes.to_numpy() == 0
 
         # Apply the mask to the locales table and reset the index
         # We now have a list of all the descriptive street names which can
@@ -318,54 +1071,61 @@ class Root:
         self.global_locales = self.global_locales[mask]
         self.global_locales.reset_index(inplace=True, drop=True)
 
-        # Duplicate the data dataframe
-        modified_crimes = self.all_crimes
-
-        # Get the indexes of the columns of interest
-        street_id_loc = modified_crimes.columns.get_loc("location.street.name")
-        latitude_id_loc = modified_crimes.columns.get_loc("location.latitude")
-        longitude_id_loc = modified_crimes.columns.get_loc("location.longitude")
-        area_name_id_loc = modified_crimes.columns.get_loc("area name")
-        pretty_id_loc = modified_crimes.columns.get_loc("pretty name")
-        type_id_loc = modified_crimes.columns.get_loc("Type")
-
-        # Loop through all the crimes in the dataset
-        for i in trange(0, modified_crimes.shape[0]):
-            # Copy the current street name into a local variable
-            street = modified_crimes.iloc[i][street_id_loc]
+        crimes = self.all_crimes
 
-            # Loop through all the non descriptive street names
-            for x in ignore:
-                # If the current street contains a non descriptive name then
-                if x in street:
+        # Find which of the crimes happened at a non descriptive location
+        generic = crimes["Type"].cat.codes.to_numpy() != 0
 
-                    # Get the name of the area of the current street
-                    area_name = modified_crimes.iloc[i][area_name_id_loc]
-
-                    # Create a truth mask of which of the global locales
-                    # areas match the current area
-                    area_mask = self.mappings["area name"] == area_name
-
-                    # Get the local latitude and logntitude values from the data
-                    street_lat = modified_crimes.iloc[i][latitude_id_loc]
-                    street_lon = modified_crimes.iloc[i][longitude_id_loc]
+        if not generic.any():
+            return
 
-                    lat_mask = self.mappings["location.latitude"] == street_lat
-                    lon_mask = self.mappings["location.longitude"] == street_lon
+        # Look up the new name of every non descriptive location with a single
+        # merge against the mappings, each location appears once in the
+        # mappings so the merge keeps the order and number of the rows
+        keys = [
+            "area name",
+            "location.latitude",
+            "location.longitude",
+            "location.street.name",
+        ]
+        # A fixed row keeps its non descriptive name in the type, so the name
+        # is taken from there and fixing the same rows twice is harmless
+        points = crimes.loc[generic, keys[:-1]].assign(
+            **{"location.street.name": crimes.loc[generic, "Type"].astype(str)}
+        )
+        new_streets = (
+            points.merge(self.mappings[keys + ["new name"]], on=keys, how="left")[
+                "new name"
+            ]
+            .fillna(points["location.street.name"].reset_index(drop=True))
+            .to_numpy()
+        )
 
-                    mask = area_mask & lat_mask & lon_mask
+        # Work out the positions of the rows to change
+        rows = np.flatnonzero(generic)
 
-                    # Get the name of the new street and create the new pretty
-                    # name
-                    new_street = self.mappings[mask]["new name"].reset_index(drop=True)[
-                        0
-                    ]
-                    pretty_name = street + " - " + new_street + " - " + area_name
+        # The cube has to be built again if it counted any of the rows that
+        # change, rows added by update_data are only counted after this
+        changed = rows[
+            crimes["location.street.name"].iloc[rows].astype(object).to_numpy()
+            != new_streets
+        ]
+        if self.cube is not None and (changed < self.cube.counts.sum()).any():
+            self.cube = None
+
+        # The street names are a categorical so the new names have to be added
+        # as categories before they can be used
+        streets = self.all_crimes["location.street.name"].astype("category")
+        new_categories = pd.Index(new_streets).unique()
+        streets = streets.cat.add_categories(
+            new_categories.difference(streets.cat.categories)
+        )
+        self.all_crimes["location.street.name"] = streets
 
-                    # Set the names in the crimes dataframe to the new names
-                    self.all_crimes.iat[i, pretty_id_loc] = pretty_name
-                    self.all_crimes.iat[i, street_id_loc] = new_street
-                    self.all_crimes.iat[i, type_id_loc] = street
+        # Set the street names in the crimes dataframe to the new names, the
+        # type still holds the non descriptive name
+        column = self.all_crimes.columns.get_loc("location.street.name")
+        self.all_crimes.iloc[rows, column] = new_streets
 
     def hotspots_graph(self, top, location, location_type=["All"]):
         """Draw a bargraph of the rates of assult at the top hotspots
@@ -387,39 +1147,35 @@ class Root:
 
         # Check if fix locations has been run yet, this graph only produces
         # valid data if the locations have been fixed
-        if self.global_locales.empty:
+        if not hasattr(self, "global_locales") or self.global_locales.empty:
             self.fix_locations()
 
-        # If the value passed to top is none then it means graph all locations
-        if top is None:
-            top = len(self.all_crimes)
-
         # Check if the location type input is valid
         for x in location_type:
             assert x == "Street" or x == "All" or (x in ignore)
 
-        # If the location_type was ['All'] set
+        # If the location_type was ['All'] use every type
         if location_type == ["All"]:
-            location_type = ignore
-            location_type.append("Street")
+            location_type = list(location_types.categories)
 
-        search = "|".join(location_type)
         print("List of locations: ", location_type)
-        print("Search term: ", search)
-        # Create a mask of all the crimes that happened at the
-        # given location type
-        mask = self.all_crimes["Type"].str.contains(search)
 
-        self.crime_list = self.all_crimes.loc[mask]
+        # Read the counts of the top locations of the given location types
+        # from the cube, a location is its type, street and area
+        locations = self.count_cube().totals(
+            ["Type", "location.street.name", "area name"],
+            selection={"Type": location_type},
+            top=top,
+        )
 
         # Create a pandas datafram containing the frequency counts of the top
         # locations
-        self.hotspots = self.crime_list["pretty name"].value_counts()[:top]
-        self.hotspots = self.hotspots.to_frame()
-
-        # Reset the index and rename the columns
-        self.hotspots.reset_index(inplace=True)
-        self.hotspots.columns = ["locations", "frequency"]
+        self.hotspots = pd.DataFrame(
+            {
+                "locations": self.pretty_names(locations).astype(str),
+                "frequency": locations["crimes"],
+            }
+        )
 
         # Set the seaborn font scale
         sns.set(font_scale=4)
@@ -481,32 +1237,480 @@ class Root:
         # Save the graph
         fig.savefig("locationFrequency.jpeg")
 
+    def count_cube(self):
+        """Get the count of the crimes in each area, category, location type,
+        location and month
+
+        The count is built from self.all_crimes the first time it is needed and
+        kept up to date by update_data, so hotspot rankings and monthly trends
+        can be read from it without going over the crimes again.
+
+        :return: The count of the crimes
+        :rtype: crime_hotspots_uk.cube.CountCube
+        """
+        if self.cube is None:
+            self.cube = CountCube()
+            self.cube.add(self.all_crimes, self.row_months(self.all_crimes))
+
+        return self.cube
+
+    def emerging_hotspots(self, top=None, location_type=["All"], months=None):
+        """Rank locations by how strongly the number of crimes at them is rising
+
+        The number of crimes at each location in each month is read from the
+        count cube and every location is tested for a trend at once with the
+        Mann-Kendall test. Locations are only compared with themselves, so a
+        quiet location that is getting steadily worse can rank above a busy one
+        that isn't changing.
+
+        :param top: How many locations to return, if this is None every
+            location is returned
+        :type top: int, optional
+        :param location_type: The types of location to test, each entry must be
+            either `Street` or a value in the ignore list in constants.py, or
+            `All` to test every location
+        :type location_type: list, optional
+        :param months: The months to look at in the format yyyy-mm, if this is
+            None every month data was requested for is used. Months with no
+            crimes count as zero
+        :type months: list, optional
+
+        :return: A row for each location from the most significant rise to the
+            most significant fall, with the `locations` name, the number of
+            `crimes`, the Mann-Kendall statistic `S`, its `z score` and two
+            sided `p value`, and the Sen `slope` in crimes per month
+        :rtype: pandas.DataFrame
+        """
+        for x in location_type:
+            assert x == "Street" or x == "All" or (x in ignore)
+
+        selection = None
+        if location_type != ["All"]:
+            selection = {"Type": location_type}
+
+        cube = self.count_cube()
+
+        # A month with no crimes anywhere is still part of the trend, so use the
+        # whole window, stretched to cover data from archives outside of it
+        if months is None:
+            months = self.get_months()
+            if len(cube.months) > 0:
+                months = month_range(
+                    min(months[0], cube.months[0]), max(months[-1], cube.months[-1])
+                )
+
+        locations, series = cube.series(
+            ["Type", "location.street.name", "area name"], selection, months
+        )
+
+        statistic, scores, slopes = mann_kendall(series)
+
+        trends = pd.DataFrame(
+            {
+                "locations": self.pretty_names(locations).astype(str),
+                "crimes": series.sum(axis=1),
+                "S": statistic.astype(np.int64),
+                "z score": scores,
+                "p value": p_values(scores),
+                "slope": slopes,
+            }
+        )
+
+        trends = trends.sort_values(["z score", "crimes"], ascending=False)
+
+        return trends.iloc[:top].reset_index(drop=True)
+
+    def density_hotspots(
+        self, top=None, cell_size=hotspot_cell_size, bandwidth=hotspot_bandwidth
+    ):
+        """Rank the cells of a grid over the areas by the density of crimes
+
+        Unlike hotspots_graph, which counts the crimes at each named location,
+        the crimes are counted in the cells of a square grid and the counts are
+        smoothed with a gaussian kernel. This joins up crimes that the police
+        have snapped to separate points close to each other. The grid is
+        clipped to the boundary of each area with fishnet, a cell on the
+        boundary between two areas is given to the area that holds most of it.
+
+        :param top: How many cells to return, if this is None every cell inside
+            the areas is returned
+        :type top: int, optional
+        :param cell_size: The width of each cell in metres
+        :type cell_size: float, optional
+        :param bandwidth: The standard deviation of the kernel in metres, zero
+            ranks the cells by their raw counts
+        :type bandwidth: float, optional
+
+        :return: A row for each cell from the highest density to the lowest,
+            with the `area name`, the `latitude` and `longitude` of the centre
+            of the cell, the smoothed `density` in crimes per square kilometre,
+            the number of `crimes` in the cell and the most common `street` in
+            the cell. A cell with no crimes in it takes the street of the
+            nearest crime
+        :rtype: pandas.DataFrame
+        """
+        shapes = self.locations.locations["shapes"].to_numpy()
+        names = self.locations.locations["Name"].to_numpy()
+
+        # Project everything onto a flat grid in metres centred on the areas
+        bounds = shapely.total_bounds(shapes)
+        origin = (bounds[1] + bounds[3]) / 2
+        shapes = [shape_to_metres(shape, origin) for shape in shapes]
+
+        crimes = self.all_crimes
+        x, y = to_metres(
+            crimes["location.latitude"], crimes["location.longitude"], origin
+        )
+
+        extent = grid_extent(shapely.total_bounds(shapes), cell_size)
+        xmin, ymin, width, height = extent
+
+        counts = count_grid(x, y, cell_size, extent)
+        density = smooth_grid(counts, bandwidth, cell_size) / (cell_size / 1000) ** 2
+
+        # Find which cells are inside each area, the centre of the part of a
+        # cell inside an area is always inside the cell
+        cells = []
+        for name, shape in zip(names, shapes):
+            parts = np.array(self.fishnet(shape, cell_size), dtype=object)
+            parts = parts[shapely.area(parts) > 0]
+
+            centres = shapely.get_coordinates(shapely.centroid(parts))
+            cell = np.floor(centres / cell_size).astype(int) - [xmin, ymin]
+
+            cells.append(
+                pd.DataFrame(
+                    {
+                        "area name": name,
+                        "column": cell[:, 0],
+                        "row": cell[:, 1],
+                        "overlap": shapely.area(parts),
+                    }
+                )
+            )
+        cells = pd.concat(cells, ignore_index=True)
+        cells = cells.sort_values("overlap", ascending=False, kind="stable")
+        cells = cells.drop_duplicates(["column", "row"])
+
+        cells["density"] = density[cells["column"], cells["row"]]
+        cells["crimes"] = counts[cells["column"], cells["row"]].astype(int)
+
+        # Label each cell with the street most of its crimes were on
+        column = np.floor(x / cell_size).astype(int) - xmin
+        row = np.floor(y / cell_size).astype(int) - ymin
+        valid = (column >= 0) & (column < width) & (row >= 0) & (row < height)
+
+        streets = crimes["location.street.name"].astype("category")
+        labels = pd.DataFrame(
+            {
+                "column": column[valid],
+                "row": row[valid],
+                "street": streets.cat.codes.to_numpy()[valid],
+            }
+        )
+        labels = labels[labels["street"] >= 0].value_counts()
+        labels = labels.reset_index().drop_duplicates(["column", "row"])
+        labels["street"] = streets.cat.categories[labels["street"]]
+
+        cells = cells.merge(
+            labels[["column", "row", "street"]], on=["column", "row"], how="left"
+        )
+        cells["street"] = (
+            cells["street"].astype(object).where(cells["street"].notna(), None)
+        )
+
+        # Turn the cells back into the latitude and longitude of their centres
+        cells["latitude"], cells["longitude"] = from_metres(
+            (cells["column"] + xmin + 0.5) * cell_size,
+            (cells["row"] + ymin + 0.5) * cell_size,
+            origin,
+        )
+
+        cells = cells.sort_values("density", ascending=False, kind="stable")
+        cells = cells[
+            ["area name", "latitude", "longitude", "density", "crimes", "street"]
+        ]
+
+        cells = cells.iloc[:top].reset_index(drop=True)
+
+        # Smoothing gives cells with no crimes of their own a density, these
+        # are named after the nearest point a crime was snapped to
+        empty = cells["street"].isna().to_numpy()
+        if empty.any():
+            points = crimes[
+                ["location.latitude", "location.longitude", "location.street.name"]
+            ]
+            points = points.dropna().drop_duplicates()
+
+            _, index = nearest(
+                cells.loc[empty, "latitude"],
+                cells.loc[empty, "longitude"],
+                points["location.latitude"],
+                points["location.longitude"],
+            )
+
+            names = np.append(
+                points["location.street.name"].to_numpy(dtype=object), None
+            )
+            cells.loc[empty, "street"] = names[index]
+
+        return cells
+
+    def significant_hotspots(
+        self, top=None, distance=neighbour_distance, cell_size=None
+    ):
+        """Rank locations by how significant a hotspot they are
+
+        The Getis-Ord Gi* statistic of each location is found from the number
+        of crimes at it and at its neighbours, the locations within distance of
+        it. A high score means the location and its neighbours have more crimes
+        than would be expected by chance, rather than just the location itself.
+
+        :param top: How many locations to return, if this is None every
+            location is returned
+        :type top: int, optional
+        :param distance: How close in metres two locations have to be to count
+            as neighbours
+        :type distance: float, optional
+        :param cell_size: If this is None the locations are the points the
+            police snapped the crimes to, otherwise they are the cells of a grid
+            this many metres wide clipped to the areas like in density_hotspots
+        :type cell_size: float, optional
+
+        :return: A row for each location from the highest score to the lowest,
+            with the `area name`, `latitude`, `longitude`, most common `street`
+            and number of `crimes` at the location, its Gi* `z score` and the
+            two sided `p value` of the score
+        :rtype: pandas.DataFrame
+        """
+        if cell_size is None:
+            locations = self.location_counts()
+        else:
+            locations = self.density_hotspots(cell_size=cell_size, bandwidth=0)
+            locations = locations[
+                ["area name", "latitude", "longitude", "street", "crimes"]
+            ]
+
+        weights = neighbour_weights(
+            locations["latitude"], locations["longitude"], distance
+        )
+
+        locations["z score"] = getis_ord(locations["crimes"], weights)
+        locations["p value"] = p_values(locations["z score"])
+
+        locations = locations.sort_values(
+            "z score", ascending=False, kind="stable", na_position="last"
+        )
+
+        return locations.iloc[:top].reset_index(drop=True)
+
+    def location_counts(self):
+        """Count the crimes at each point the police snapped them to
+
+        :return: A row for each point with the `area name`, `latitude`,
+            `longitude`, most common `street` and number of `crimes` at it
+        :rtype: pandas.DataFrame
+        """
+        columns = {
+            "location.latitude": "latitude",
+            "location.longitude": "longitude",
+            "location.street.name": "street",
+            "area name": "area name",
+        }
+        points = ["latitude", "longitude"]
+
+        counts = self.all_crimes.groupby(list(columns), observed=True).size()
+        counts = counts.rename("crimes").reset_index().rename(columns=columns)
+
+        # A point could have more than one name once the locations are fixed,
+        # or be in more than one area, so the most common is kept
+        counts = counts.sort_values("crimes", ascending=False, kind="stable")
+        locations = counts.drop_duplicates(points).set_index(points)
+        locations["crimes"] = counts.groupby(points)["crimes"].sum()
+
+        locations = locations.reset_index()
+        locations["street"] = locations["street"].astype(object)
+        locations["area name"] = locations["area name"].astype(object)
+
+        return locations[["area name", "latitude", "longitude", "street", "crimes"]]
+
     # UTILITY FUNCTIONS
     def fishnet(self, geometry, threshold):
         """Divide a shapely geometry into small sections
 
-        .. note:: This function is not currently used and is not doccumented
-
-        """
-        bounds = geometry.bounds
-        xmin = int(bounds[0] // threshold)
-        xmax = int(bounds[2] // threshold)
-        ymin = int(bounds[1] // threshold)
-        ymax = int(bounds[3] // threshold)
-        result = []
-        for i in range(xmin, xmax + 1):
-            for j in range(ymin, ymax + 1):
-                b = box(
-                    i * threshold,
-                    j * threshold,
-                    (i + 1) * threshold,
-                    (j + 1) * threshold,
-                )
-                g = geometry.intersection(b)
-                if g.is_empty:
-                    continue
-                result.append(g)
-        return result
+        The geometry is cut along a grid of squares with lines at whole
+        multiples of threshold. Every square is built and tested against the
+        geometry at once, and only the squares that cross the boundary of the
+        geometry have to be cut.
+
+        :param geometry: The shape to divide
+        :type geometry: shapely.Geometry
+        :param threshold: The width and height of each square, in the same
+            units as the coordinates of geometry
+        :type threshold: float
+
+        :return: The non empty parts of the geometry inside each square, in
+            order of the square's column and then its row
+        :rtype: list
+        """
+        xmin, ymin, width, height = grid_extent(geometry.bounds, threshold)
+
+        # Build every square of the grid in the same order as the columns and
+        # then the rows
+        i, j = np.meshgrid(
+            np.arange(xmin, xmin + width),
+            np.arange(ymin, ymin + height),
+            indexing="ij",
+        )
+        squares = shapely.box(
+            i.ravel() * threshold,
+            j.ravel() * threshold,
+            (i.ravel() + 1) * threshold,
+            (j.ravel() + 1) * threshold,
+        )
+
+        shapely.prepare(geometry)
+
+        # Squares entirely inside the geometry are kept whole, the ones that
+        # cross the boundary are cut to the part inside the geometry
+        squares = squares[shapely.intersects(geometry, squares)]
+        inside = shapely.contains_properly(geometry, squares)
+        squares[~inside] = shapely.intersection(squares[~inside], geometry)
+
+        return [g for g in squares if not g.is_empty]
+
+    def get_months(self):
+        """Get the list of months data is requested for
+
+        :return: The months in the format yyyy-mm, oldest first
+        :rtype: list
+        """
+
+        # Set the start and end date fo the request
+        end_date = date.today() - dateutil.relativedelta.relativedelta(months=1)
+        start_date = end_date - dateutil.relativedelta.relativedelta(months=37)
+
+        # Create a list of dates that can be added to the API request
+        dates = (
+            pd.date_range(start_date, end_date - timedelta(days=1), freq="MS")
+            .strftime("%Y-%m")
+            .tolist()
+        )
+
+        return dates
+
+    def row_months(self, crimes):
+        """Get the month of each row in a dataframe of crimes
+
+        :param crimes: The crimes, stop and searches only have the date and
+            time of the search so the month is taken from that
+        :type crimes: pandas.DataFrame
+
+        :return: The month of each row in the format yyyy-mm
+        :rtype: pandas.Series
+        """
+        if self.usage == "stops-street":
+            months = crimes["datetime"]
+        else:
+            months = crimes["month"]
+
+        return months.astype(str).str[:7]
+
+    def month_strings(self, crimes):
+        """Get the distinct months in a dataframe of crimes
+
+        :param crimes: The crimes
+        :type crimes: pandas.DataFrame
+
+        :return: The distinct months in the format yyyy-mm
+        :rtype: set
+        """
+        return set(self.row_months(crimes).unique())
+
+    def check_crime_type(self, crime_type):
+        """Check a crime type, or list of crime types, can be downloaded
+
+        :param crime_type: The readable name of the crime type or a list of them
+        :type crime_type: string or list
+
+        :raise AssertionError: This error is raised if any of the crime types
+            aren't in self.crime_types
+        """
+        if isinstance(crime_type, list):
+            assert len(crime_type) > 0
+            for x in crime_type:
+                assert x in self.crime_types.keys()
+        else:
+            assert crime_type in self.crime_types.keys()
+
+    def wanted_categories(self):
+        """Get the categories of the crime types that have been asked for
+
+        :return: The categories used in the API URLs, or None if all crime was
+            asked for
+        :rtype: list
+        """
+        if isinstance(self.crime_type, list):
+            crime_types = self.crime_type
+        else:
+            crime_types = [self.crime_type]
+
+        if "All crime" in crime_types:
+            return
+
+        return [self.crime_types[crime_type] for crime_type in crime_types]
+
+    def split_locally(self):
+        """Check if the crime types are split out of the all crime data
+
+        This is done when fetch_all is set or several crime types are asked for
+        at once, so every crime type can share the same requests and cache.
+
+        :return: True if the `all-crime` data is downloaded and then filtered
+        :rtype: bool
+        """
+        if self.wanted_categories() is None:
+            return False
+
+        return self.fetch_all or isinstance(self.crime_type, list)
+
+    def cache_category(self):
+        """Get the category the current crime type is cached under
+
+        :return: The category used in the API URLs for the crime type, this is
+            `all-crime` if the crime types are split out locally
+        :rtype: string
+        """
+        if self.wanted_categories() is None or self.split_locally():
+            return self.crime_types["All crime"]
+
+        return self.crime_types[self.crime_type]
+
+    def location_string(self, coords):
+        """Turn a list of coordinates into the format used by the API
+
+        :param coords: A two deep list containing longitude and latitude
+            coordinate pairs
+        :type coords: list
+
+        :return: The coordinates as `lat,lng` pairs seperated by `:`
+        :rtype: string
+        """
+
+        # Create an empty string that will be used to send the coordinates in
+        # the API request
+        location = ""
+
+        # Loop through all the coordinate pairs
+        for i in range(0, len(coords)):
+            # Add each coordinate pair to the API request string
+            temp = str(coords[i][1])[0:9] + "," + str(coords[i][0])[0:9] + ":"
+            location = location + temp
+
+        # Remove the traling `:` from the request
+        location = location[:-1]
+
+        return location
 
     def url_gen(self, location, date):
         """Generate the url for API requests
@@ -524,7 +1728,7 @@ class Root:
                 baseURL
                 + self.usage
                 + "/"
-                + self.crime_types[self.crime_type]
+                + self.cache_category()
                 + "?poly="
                 + location
                 + "&date="
@@ -541,152 +1745,185 @@ class Root:
         return polygon
 
     def cache_data(self):
+        """Save the downloaded data to the cache so it can be reused offline
+
+        :raise locations_not_fixed_yet: This error is raised if fix_locations
+            has not been run yet
+        """
 
         try:
             self.global_locales.empty
         except AttributeError:
             raise locations_not_fixed_yet
 
-        location_type = self.locations.__name__
-
-        cache = os.path.expanduser("~/.crime_hotspots_cache/" + location_type)
-
-        areas = np.unique(self.all_crimes["area name"])
-
-        crime_types = np.unique(self.all_crimes["category"].astype(str))
+        self.write_cache()
 
-        for area in areas:
-            area_mask = self.all_crimes["area name"] == area
-
-            for crime_type in crime_types:
-                type_mask = self.all_crimes["category"].astype(str) == crime_type
-
-                months = np.unique(self.all_crimes["month"])
-
-                directory = cache + "/" + area + "/" + self.usage + "/" + crime_type
-                Path(directory).mkdir(parents=True, exist_ok=True)
+    def warm_cache(self, crime_type):
+        """Download data for a crime type and save it straight to the cache
 
-                for month in months:
-                    month_mask = self.all_crimes["month"] == month
+        This can be used to fill the cache ahead of time, for instance from a
+        scheduled job, without having to fix the locations first.
 
-                    final_mask = area_mask & type_mask & month_mask
+        :param crime_type: The crime type to download the data for
+        :type crime_type: string
+        """
+        self.get_data(crime_type)
+        self.write_cache()
 
-                    file_name = directory + "/" + str(month) + ".csv"
+    def write_cache(self):
+        """Write every area and month in self.all_crimes to the cache
 
-                    self.all_crimes[final_mask].to_csv(file_name, index=False)
+        The data is written under the category it was downloaded for, so it is
+        found again the next time the same crime type is asked for. When the
+        crime types are split out of the all crime data locally the data was
+        cached whole as it was downloaded, so nothing more is written.
+        """
 
-    def import_cache(self, location_type, area, month, category=None):
-        file_name = os.path.expanduser(
-            "~/.crime_hotspots_cache/"
-            + location_type
-            + "/"
-            + area
-            + "/"
-            + "crimes-street"
-            + "/"
-            + category
-            + "/"
-            + month
-            + ".csv"
-        )
+        if self.split_locally():
+            self.cache.save()
+            return
 
-        if Path(file_name).is_file():
-            data = pd.read_csv(file_name)
-            return data
-        else:
-            return None
+        category = self.cache_category()
+
+        # The street names the police gave are cached rather than the fixed
+        # ones, so the cache holds the same data however it was written and
+        # the locations can be fixed again with newer mappings
+        streets = self.unfixed_streets(self.all_crimes).astype("category")
+        all_crimes = self.all_crimes.assign(**{"location.street.name": streets})
+
+        # Split the data into its partitions in a single pass
+        partitions = []
+        written = set()
+        for (area, month), crimes in all_crimes.groupby(
+            ["area name", "month"], observed=True, sort=False
+        ):
+            partitions.append((crimes, area, category, str(month)))
+            written.add((area, str(month)))
+
+        # Record the months that had no data in an area so they aren't
+        # downloaded again
+        areas = np.unique(self.all_crimes["area name"])
+        months = np.unique(self.all_crimes["month"].astype(str))
+        for area in areas:
+            for month in months:
+                if (area, month) not in written:
+                    partitions.append(
+                        (self.all_crimes.iloc[0:0], area, category, month)
+                    )
+
+        self.cache.write_all(partitions, self.downloader.workers)
+        self.cache.save()
+
+    def import_cache(self, area, month, category=None):
+        """Load a month of data for an area from the cache
+
+        :param area: The name of the area
+        :type area: string
+        :param month: The month in the format yyyy-mm
+        :type month: string
+        :param category: The crime category to load
+        :type category: string, optional
+
+        :return: The cached data or None if the month isn't cached
+        :rtype: pandas.DataFrame
+        """
+        return self.cache.read(area, category, [month])
+
+    def create_mappings(self, max_distance=match_radius):
+        """Work out which street each non descriptive location is on
+
+        Every distinct location in self.all_crimes is listed along with how
+        many crimes happened there. Locations with a non descriptive name (one
+        in the ignore list) are given the name of the nearest location in the
+        same area with a descriptive name, using the great circle distance
+        between them. The matches are kept in the mapping store so locations
+        that have been seen before are not matched again.
+
+        :param max_distance: The furthest away in metres the descriptive
+            location can be, if there is none in range the new name is set to
+            `DEADBEEF`. If this is None the nearest location is always used
+        :type max_distance: float, optional
+
+        :return: The distinct locations with the name they map to in the
+            `new name` column
+        :rtype: pandas.DataFrame
+        """
+        # Once a location has been fixed its street name is the new name, so
+        # use the name the police gave it
+        locations = self.all_crimes[
+            [
+                "location.latitude",
+                "location.longitude",
+                "location.street.name",
+                "area name",
+                "Type",
+            ]
+        ].copy()
+        locations["location.street.name"] = self.unfixed_streets(self.all_crimes)
 
-    def create_mappings(self):
         self.mappings = (
-            self.all_crimes.groupby(
+            locations.groupby(
                 [
                     "location.latitude",
                     "location.longitude",
                     "location.street.name",
                     "area name",
-                ]
+                    "Type",
+                ],
+                observed=True,
             )
             .size()
             .reset_index()
         )
 
-        street_id_loc = self.mappings.columns.get_loc("location.street.name")
-        latitude_id_loc = self.mappings.columns.get_loc("location.latitude")
-        longitude_id_loc = self.mappings.columns.get_loc("location.longitude")
-
-        mask = self.mappings["location.street.name"].str.match("|".join(ignore))
-        locales = self.mappings[~mask].reset_index(drop=True)
-
-        new_cols = []
-
-        for row in trange(0, self.mappings.shape[0]):
-
-            if self.mappings.iloc[row, street_id_loc] in ignore:
-                # create a new mapping
-                # Get the local latitude and logntitude values from the data
-                street_lat = self.mappings.iloc[row, latitude_id_loc]
-                street_lon = self.mappings.iloc[row, longitude_id_loc]
-
-                if row == 145:
-                    print("Here")
-
-                # Set a really high value for the minimum distance between
-                # points, as the program calculates distances betwen the
-                # street and the possilbe locales this will be updated to
-                # represent what the smallest distance is
-                min_distance = 1000000
-
-                # Set the index to -1 so we know if no nearby locale was
-                # found
-                min_distance_index = -1
+        streets = self.mappings["location.street.name"]
 
-                for temp_row in range(0, locales.shape[0]):
-                    # Get the latitude and longitude of the current
-                    # candidate locale
-                    locale_lat = locales.iloc[temp_row, latitude_id_loc]
-                    locale_lon = locales.iloc[temp_row, longitude_id_loc]
+        generic = self.mappings["Type"].cat.codes.to_numpy() != 0
 
-                    # Calculate the difference between the current street
-                    # and the candidate locale
+        # Copy across the names so descriptive locations keep their own name
+        new_names = streets.to_numpy(dtype=object, copy=True)
+        distances = np.zeros(self.mappings.shape[0])
 
-                    lat_diff = street_lat - locale_lat
-                    lon_diff = street_lon - locale_lon
+        areas = self.mappings["area name"].to_numpy()
+        for area in np.unique(areas[generic]):
+            in_area = areas == area
 
-                    # Calculate the difference between the two points
-                    # TODO: Change this to the haversine formula
-                    distance = sqrt((lat_diff) ** 2 + (lon_diff) ** 2)
+            resolved = self.mapping_store.resolve(
+                area,
+                self.mappings[in_area & ~generic],
+                self.mappings[in_area & generic],
+            )
 
-                    # If the distance is the smalles so far
-                    if distance < min_distance:
-                        # Update the minimum distance and the index
-                        min_distance = distance
-                        min_distance_index = temp_row
+            new_names[in_area & generic] = resolved["new name"].to_numpy()
+            distances[in_area & generic] = resolved["distance"].to_numpy()
 
-                if min_distance_index > -1:
-                    temp = [locales.iloc[min_distance_index, street_id_loc]]
-                else:
-                    print("No match found within bounds")
-                    temp = ["DEADBEEF"]
-                new_cols.append(temp)
+        if max_distance is not None:
+            distances[distances > max_distance] = np.inf
 
-            else:
-                # copy across the name so its on the new name column as well
-                temp = [self.mappings.iloc[row, street_id_loc]]
-                new_cols.append(temp)
+        # Locations with nothing in range get a placeholder name
+        unmatched = np.isinf(distances)
+        new_names[unmatched] = "DEADBEEF"
 
-        new_cols = pd.DataFrame(new_cols, columns=["new name"])
+        if unmatched.any():
+            print(
+                "No match found within bounds for",
+                np.count_nonzero(unmatched),
+                "locations",
+            )
 
-        self.mappings = pd.concat([self.mappings, new_cols], axis=1)
+        self.mappings["new name"] = new_names
         return self.mappings
 
     def export(self, name, file_type):
         file_path = os.path.expanduser("~/")
         file_path = file_path + "/" + name
 
+        # Add the pretty names back in as they aren't stored
+        temp = self.all_crimes.assign(**{"pretty name": self.pretty_names()})
+
         if file_type == "csv":
-            self.all_crimes.to_csv(file_path)
+            temp.to_csv(file_path)
         elif file_type == "sav":
-            temp = self.all_crimes
             temp.columns = [col.replace(" ", "_") for col in temp.columns]
             write_sav(temp, file_path)
 
@@ -718,6 +1955,15 @@ class http_error_code(Exception):
                 + "This error probably means a cosntant variable has been spelt incorrectly"  # noqa: E501
             )
             self.message = message
+        elif code == 414:
+            message = (
+                "ERROR: URL too long, the boundary has too many points\n"
+                + "URL was:"
+                + url
+                + "\n"
+                + "The police API only accepts requests shorter than 4096 characters"
+            )
+            self.message = message
         elif code == 429:
             message = (
                 "ERROR: response code 429, too many requests\n"
@@ -735,6 +1981,7 @@ class http_error_code(Exception):
                 + "\n"
                 + "Doccumentation at: https://data.police.uk/docs/api-call-limits/"
             )
+            self.message = message
         else:
             message = (
                 "ERROR: unkown response code\n"
@@ -744,5 +1991,8 @@ class http_error_code(Exception):
                 + "response code: "
                 + str(code)
             )
+            self.message = message
 
+        self.code = code
+        self.url = url
         super().__init__(self.message)
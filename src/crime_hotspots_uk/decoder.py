@@ -0,0 +1,97 @@
+"""
+This module turns the JSON returned by the police API into dataframes. Rather
+than building the whole response as python objects and flattening it with
+`json_normalize`, the response is decoded one record at a time and only the
+fields that are used are copied into a list for each column. The dataframe is
+then built once from the finished columns.
+"""
+
+import json
+
+import pandas as pd
+
+from crime_hotspots_uk.archives import search_columns, street_columns
+
+# The fields kept from each crime and stop and search, nested fields are written
+# with a `.` between each level like json_normalize does. These are the columns
+# read from the archives along with a few that only the API returns
+crime_fields = list(street_columns.values()) + [
+    "id",
+    "location_type",
+    "outcome_status.date",
+]
+search_fields = list(search_columns.values()) + [
+    "location.street.name",
+    "involved_person",
+    "outcome_object.id",
+    "outcome_object.name",
+]
+
+decoder = json.JSONDecoder()
+
+
+def records(text):
+    """Decode the records in a JSON array one at a time
+
+    :param text: The body of the response, a JSON array of objects
+    :type text: string
+
+    :raise ValueError: This error is raised if the text isn't a JSON array
+
+    :return: Each record in the array
+    :rtype: generator
+    """
+    whitespace = json.decoder.WHITESPACE
+
+    index = whitespace.match(text, 0).end()
+    if text[index : index + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    index = whitespace.match(text, index + 1).end()
+
+    if text[index : index + 1] == "]":
+        return
+
+    while True:
+        record, index = decoder.raw_decode(text, index)
+        yield record
+
+        index = whitespace.match(text, index).end()
+        if text[index : index + 1] == "]":
+            return
+        if text[index : index + 1] != ",":
+            raise ValueError("Expected a `,` or `]` at position " + str(index))
+        index = whitespace.match(text, index + 1).end()
+
+
+def decode_response(text, usage):
+    """Decode a response from the crimes-street or stops-street API method
+
+    :param text: The body of the response
+    :type text: string
+    :param usage: Either `crimes-street` or `stops-street`
+    :type usage: string
+
+    :return: A row for each record with a column for each of the fields kept,
+        fields that are missing from a record are left empty
+    :rtype: pandas.DataFrame
+    """
+    if usage == "crimes-street":
+        fields = crime_fields
+    else:
+        fields = search_fields
+
+    paths = [field.split(".") for field in fields]
+    columns = [[] for field in fields]
+
+    for record in records(text):
+        for path, column in zip(paths, columns):
+            value = record
+            for key in path:
+                # Nested objects such as the outcome status can be null
+                if not isinstance(value, dict):
+                    value = None
+                    break
+                value = value.get(key)
+            column.append(value)
+
+    return pd.DataFrame(dict(zip(fields, columns)))
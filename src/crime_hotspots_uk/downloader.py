@@ -0,0 +1,141 @@
+"""
+This module is used to send requests to the data.police.uk API concurrently while
+staying within the `API call limits <https://data.police.uk/docs/api-call-limits/>`_.
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from tqdm.auto import tqdm
+
+from crime_hotspots_uk.constants import (
+    backoff_base,
+    backoff_cap,
+    max_retries,
+    max_workers,
+    rate_burst,
+    rate_limit,
+    retry_codes,
+)
+from crime_hotspots_uk.session import Session
+
+
+class Downloader:
+    """Send GET requests to the police API from a pool of threads, through a
+    rate limited session
+    """
+
+    def __init__(
+        self,
+        session=None,
+        workers=max_workers,
+        rate=rate_limit,
+        burst=rate_burst,
+        retries=max_retries,
+    ):
+        """
+        :param session: The session the requests are sent through, if none is
+            passed a new one is created with a connection pool big enough for
+            all the workers. The rate limit is kept by the session so every
+            downloader sharing it shares the limit
+        :type session: crime_hotspots_uk.session.Session, optional
+        :param workers: The number of requests that can be in flight at once, if
+            this is 1 requests are sent one after the other
+        :type workers: int, optional
+        :param rate: The maximum sustained number of requests per second, only
+            used if no session is passed
+        :type rate: float, optional
+        :param burst: The maximum number of requests that can be sent in one
+            burst, only used if no session is passed
+        :type burst: int, optional
+        :param retries: How many times a failed request is retried before its
+            response is returned to the caller
+        :type retries: int, optional
+        """
+        if session is None:
+            session = Session(pool_size=workers, rate=rate, burst=burst)
+        self.session = session
+
+        self.workers = workers
+        self.retries = retries
+
+    def get(self, url):
+        """Send a single GET request, retrying it if the API is overloaded
+
+        Responses with a code in `retry_codes` are retried after a jittered
+        exponential backoff, as are connection errors and timeouts. If the
+        request still fails after all the retries the last response is returned
+        so the caller can decide what to do with it.
+
+        :param url: The URL to request
+        :type url: string
+
+        :return: The response from the API
+        :rtype: requests.Response
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                response = None
+
+            if response is not None:
+                if response.status_code not in retry_codes or attempt >= self.retries:
+                    return response
+
+            time.sleep(self.backoff(attempt, response))
+            attempt += 1
+
+    def get_all(self, urls, desc="Months"):
+        """Send GET requests for a list of URLs concurrently
+
+        :param urls: The URLs to request
+        :type urls: list
+        :param desc: The label to use on the progress bar
+        :type desc: string, optional
+
+        :return: The responses in the same order as the URLs that were passed
+        :rtype: list
+        """
+        if self.workers <= 1 or len(urls) <= 1:
+            return [self.get(url) for url in tqdm(urls, leave=False, desc=desc)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # map returns the results in the order the URLs were passed, this
+            # keeps the output identical to sending the requests one by one
+            return list(
+                tqdm(
+                    pool.map(self.get, urls),
+                    total=len(urls),
+                    leave=False,
+                    desc=desc,
+                )
+            )
+
+    def backoff(self, attempt, response=None):
+        """Work out how long to wait before retrying a request
+
+        If the API sent a Retry-After header that is used, otherwise a random
+        time up to an exponentially growing limit is used so that threads that
+        failed together do not all retry at the same moment.
+
+        :param attempt: How many times the request has already been retried
+        :type attempt: int
+        :param response: The failed response, if there was one
+        :type response: requests.Response, optional
+
+        :return: The number of seconds to wait
+        :rtype: float
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None and retry_after.isdigit():
+                return min(backoff_cap, float(retry_after))
+
+        return random.uniform(0, min(backoff_cap, backoff_base * 2**attempt))
@@ -0,0 +1,35 @@
+"""
+This module holds the helper used to write every file in the cache. Each file is
+written to a temporary file next to it first and then moved into place, so if
+the program is stopped part way through the old file is left as it was rather
+than half written. Every write gets a temporary file of its own, so processes
+writing the same file at the same time don't write over each other's.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def atomic_write(path, writer):
+    """Write a file so it is either fully written or not changed at all
+
+    :param path: Where to write the file, the folders above it are created if
+        they don't exist
+    :type path: pathlib.Path
+    :param writer: A function that writes the contents to the path it is given,
+        if it raises an exception the temporary file is deleted
+    :type writer: function
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(descriptor)
+
+    try:
+        writer(Path(temporary))
+        os.replace(temporary, path)
+    finally:
+        # Once it has been moved into place there is nothing left to delete
+        Path(temporary).unlink(missing_ok=True)
@@ -1,4 +1,7 @@
+from functools import partial
+
 from crime_hotspots_uk.locations import generic
+from crime_hotspots_uk.metadata import Metadata
 
 from pyparliment.members.location import find
 
@@ -12,7 +15,7 @@ class Constituincy(generic.Locations):
     political representation should be implemented here.
     """
 
-    def __init__(self, names, title):
+    def __init__(self, names, title, offline=False):
         """
         Initialise the class and import data
 
@@ -21,6 +24,10 @@ class Constituincy(generic.Locations):
         :param title: A string representing what area the constiuincies represent. For
             instance `London Mayoral Constituincies`
         :type title: string
+        :param offline: If this is True the boundaries are only loaded from the
+            cache, otherwise they are downloaded if the cached copy is missing or
+            out of date
+        :type offline: bool
 
         The init function will get all constituincies with names starting with any of
         the items in names.
@@ -34,9 +41,17 @@ class Constituincy(generic.Locations):
         # Create a template list to contain the areas
         self.locations = []
 
+        # The search results are cached with the boundaries stored as WKB so
+        # they only need downloading once
+        metadata = Metadata(offline=offline)
+
         # Loop over all the names passed and import each of them
         for name in names:
-            self.locations.append(find.search(name))
+            self.locations.append(
+                metadata.load_shapes(
+                    "Constituincy/" + name, partial(find.search, name)
+                )
+            )
 
         # Concatanate the dataframes into one big dataframe of all the areas
         self.locations = pd.concat(self.locations)
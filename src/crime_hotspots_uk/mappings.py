@@ -0,0 +1,254 @@
+"""
+This module keeps the mappings from non descriptive locations (such as
+`Supermarket`) to the nearest descriptive street on disk. The police snap every
+crime and stop and search to one of a fixed set of anonymised points, so once a
+point has been resolved the answer can be reused by every later run, and by
+both crime and stop and search data.
+
+The descriptive locales differ between datasets and months, so each area keeps
+every locale it has ever seen and maps each point to the nearest of them. A
+locale that is new can only take over the points that are closer to it than to
+the locale they are stored against, so only those are changed. A stored locale
+that isn't in the current data only affects the points mapped to it, and those
+are matched against the current locales without changing what is stored.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crime_hotspots_uk.constants import cache_directory
+from crime_hotspots_uk.files import atomic_write
+from crime_hotspots_uk.spatial import nearest
+
+# The columns that identify a point, the police only use one name for each point
+# but the name is kept in the key so a renamed point is resolved again
+point_columns = ["location.latitude", "location.longitude", "location.street.name"]
+
+# Where the locale a point is mapped to is, together with the new name these
+# tell the locale apart from any other
+locale_columns = ["locale.latitude", "locale.longitude"]
+
+mapping_columns = point_columns + ["new name", "distance"] + locale_columns
+
+
+class MappingStore:
+    """The resolved non descriptive locations for one location type
+
+    The files are laid out as `<location type>/<area>/mappings.parquet` under
+    the cache directory, next to the cached data for each usage, with every
+    locale that has been seen in the area in `locales.parquet` beside it.
+    """
+
+    def __init__(self, location_type, directory=cache_directory):
+        """
+        :param location_type: The name of the location type the mappings are
+            for, for instance `Constituincy`
+        :type location_type: string
+        :param directory: Where the cache is stored
+        :type directory: string, optional
+        """
+        self.location_type = location_type
+        self.directory = Path(os.path.expanduser(directory)) / location_type
+
+    def path(self, area, name):
+        """Get the path of a file stored for an area
+
+        :param area: The name of the area
+        :type area: string
+        :param name: Either `mappings` or `locales`
+        :type name: string
+
+        :return: The path to the file
+        :rtype: pathlib.Path
+        """
+        return self.directory / str(area) / (name + ".parquet")
+
+    def points(self, frame):
+        """Get the point columns of a frame with the types they are stored with
+
+        :param frame: The points, with `location.latitude`,
+            `location.longitude` and `location.street.name` columns
+        :type frame: pandas.DataFrame
+
+        :return: The point columns in the same order as the frame
+        :rtype: pandas.DataFrame
+        """
+        return (
+            frame[point_columns]
+            .astype(
+                {
+                    "location.latitude": float,
+                    "location.longitude": float,
+                    "location.street.name": object,
+                }
+            )
+            .reset_index(drop=True)
+        )
+
+    def match(self, points, locales):
+        """Find the nearest of a set of locales to each point
+
+        :param points: The points to match, with no duplicates
+        :type points: pandas.DataFrame
+        :param locales: The locales to match them to, with no duplicates
+        :type locales: pandas.DataFrame
+
+        :return: The points with the `new name` and `distance` to the nearest
+            locale and where it is. If there are no locales the new name is
+            None and the distance is infinity
+        :rtype: pandas.DataFrame
+        """
+        distances, index = nearest(
+            points["location.latitude"],
+            points["location.longitude"],
+            locales["location.latitude"],
+            locales["location.longitude"],
+        )
+
+        # Points in an area with no locales get an index past the end of the
+        # locales, add a missing locale there for them to pick up
+        names = np.append(locales["location.street.name"].to_numpy(dtype=object), None)
+        latitudes = np.append(locales["location.latitude"].to_numpy(float), np.nan)
+        longitudes = np.append(locales["location.longitude"].to_numpy(float), np.nan)
+
+        matched = points.reset_index(drop=True)
+        matched["new name"] = names[index]
+        matched["distance"] = distances
+        matched["locale.latitude"] = latitudes[index]
+        matched["locale.longitude"] = longitudes[index]
+        return matched
+
+    def resolve(self, area, locales, points):
+        """Find the nearest descriptive locale to each non descriptive point
+
+        Only points that haven't been resolved before are matched against every
+        locale, the rest are read from disk and only checked against the
+        locales that are new. The match is always to the nearest locale however
+        far away it is, so a maximum distance can be applied afterwards without
+        resolving the points again.
+
+        :param area: The name of the area the points are in
+        :type area: string
+        :param locales: The descriptive locales seen in the area, with
+            `location.latitude`, `location.longitude` and `location.street.name`
+            columns
+        :type locales: pandas.DataFrame
+        :param points: The non descriptive points to resolve, with the same
+            columns as locales
+        :type points: pandas.DataFrame
+
+        :return: The new name of each point in the `new name` column and the
+            distance to it in metres in the `distance` column, in the same order
+            as points. If the area has no locales the new name is None and the
+            distance is infinity
+        :rtype: pandas.DataFrame
+        """
+        locales = self.points(locales).drop_duplicates(ignore_index=True)
+        points = self.points(points)
+
+        seen = self.load(area, "locales")
+        mappings = self.load(area, "mappings")
+        changed = False
+
+        # A new locale can only take over the stored points that are closer to
+        # it than to the locale they are mapped to
+        added = locales.merge(seen, how="left", indicator=True)
+        added = added[added["_merge"] == "left_only"][point_columns]
+        if added.shape[0] > 0:
+            if mappings.shape[0] > 0:
+                closer = self.match(mappings[point_columns], added)
+                update = closer["distance"].to_numpy() < mappings["distance"].to_numpy()
+                for column in ["new name", "distance"] + locale_columns:
+                    mappings.loc[update, column] = closer.loc[update, column]
+
+            seen = pd.concat([seen, added], ignore_index=True)
+            changed = True
+
+        # Points that have never been seen are matched against every locale
+        new_points = points.drop_duplicates().merge(
+            mappings[point_columns], how="left", indicator=True
+        )
+        new_points = new_points[new_points["_merge"] == "left_only"][point_columns]
+        if new_points.shape[0] > 0:
+            mappings = pd.concat(
+                [mappings, self.match(new_points, seen)], ignore_index=True
+            )
+            changed = True
+
+        # The locales are saved last so if the run is stopped in between, the
+        # new locales are checked again next time
+        if changed:
+            self.save(area, "mappings", mappings)
+            self.save(area, "locales", seen)
+
+        merged = points.merge(mappings, on=point_columns, how="left")
+
+        # The nearest of every locale seen is also the nearest of the current
+        # locales if it is one of them, the points mapped to a locale that isn't
+        # in the data any more are matched against the current locales only
+        current = locales.rename(
+            columns={
+                "location.latitude": "locale.latitude",
+                "location.longitude": "locale.longitude",
+                "location.street.name": "new name",
+            }
+        )
+        present = merged[["new name"] + locale_columns].merge(
+            current, how="left", indicator=True
+        )
+        stale = (present["_merge"] == "left_only").to_numpy()
+        if stale.any():
+            stale_points = merged.loc[stale, point_columns]
+            rematched = stale_points.merge(
+                self.match(stale_points.drop_duplicates(), locales),
+                on=point_columns,
+                how="left",
+            )
+            merged.loc[stale, "new name"] = rematched["new name"].to_numpy()
+            merged.loc[stale, "distance"] = rematched["distance"].to_numpy()
+
+        return merged[["new name", "distance"]]
+
+    def load(self, area, name):
+        """Read a file stored for an area
+
+        :param area: The name of the area
+        :type area: string
+        :param name: Either `mappings` for the resolved points or `locales` for
+            every locale that has been seen in the area
+        :type name: string
+
+        :return: The stored rows, or an empty dataframe with the right columns
+            if nothing has been stored
+        :rtype: pandas.DataFrame
+        """
+        path = self.path(area, name)
+
+        if path.exists():
+            return pd.read_parquet(path)
+
+        columns = mapping_columns if name == "mappings" else point_columns
+        frame = pd.DataFrame(columns=columns)
+        for column in columns:
+            if column not in ["location.street.name", "new name"]:
+                frame[column] = frame[column].astype(float)
+        return frame
+
+    def save(self, area, name, frame):
+        """Write a file for an area
+
+        The file is written to a temporary file first and then moved into place
+        so a run that is stopped part way through never leaves a broken file.
+
+        :param area: The name of the area
+        :type area: string
+        :param name: Either `mappings` or `locales`
+        :type name: string
+        :param frame: The rows to store
+        :type frame: pandas.DataFrame
+        """
+        path = self.path(area, name)
+        atomic_write(path, lambda temporary: frame.to_parquet(temporary, index=False))
@@ -0,0 +1,143 @@
+"""
+This module caches the metadata that is needed before any crime data can be
+downloaded, such as the list of crime categories and the boundaries of the
+areas. Keeping it on disk means objects can be created in milliseconds and
+without an internet connection once the metadata has been downloaded once.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import shapely
+
+from crime_hotspots_uk.constants import cache_directory, metadata_ttl
+from crime_hotspots_uk.files import atomic_write
+
+
+class Metadata:
+    """A small on disk cache of metadata that expires after a set time"""
+
+    def __init__(self, directory=cache_directory, ttl=metadata_ttl, offline=False):
+        """
+        :param directory: Where the cache is stored, the metadata is kept in a
+            `metadata` folder inside it
+        :type directory: string, optional
+        :param ttl: How many days the metadata stays fresh for
+        :type ttl: float, optional
+        :param offline: If this is True the metadata is never downloaded, the
+            cached copy is used no matter how old it is
+        :type offline: bool, optional
+        """
+        self.directory = Path(os.path.expanduser(directory)) / "metadata"
+        self.ttl = ttl * 24 * 60 * 60
+        self.offline = offline
+
+    def fresh(self, path):
+        """Check if a cached file can be used
+
+        :param path: The path of the cached file
+        :type path: pathlib.Path
+
+        :return: True if the file exists and either hasn't expired or the cache
+            is offline
+        :rtype: bool
+        """
+        try:
+            age = time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+        return self.offline or age <= self.ttl
+
+    def load_json(self, name, fetch):
+        """Load some metadata that can be stored as JSON
+
+        :param name: The name to store the metadata under
+        :type name: string
+        :param fetch: A function that downloads the metadata, it is only called
+            if there is no fresh copy in the cache
+        :type fetch: function
+
+        :raise offline_data_missing: This error is raised if the cache is
+            offline and the metadata has never been downloaded
+
+        :return: The metadata
+        :rtype: dict
+        """
+        path = self.directory / (name + ".json")
+
+        if self.fresh(path):
+            with open(path) as file:
+                return json.load(file)
+
+        if self.offline:
+            raise offline_data_missing(name)
+
+        data = fetch()
+
+        def write(temporary):
+            with open(temporary, "w") as file:
+                json.dump(data, file)
+
+        atomic_write(path, write)
+
+        return data
+
+    def load_shapes(self, name, fetch, column="shapes"):
+        """Load a dataframe with a column of shapely geometries
+
+        The geometries are stored as WKB in a Parquet file which is much smaller
+        and faster to load than the GeoJSON they are downloaded as.
+
+        :param name: The name to store the metadata under
+        :type name: string
+        :param fetch: A function that downloads the dataframe, it is only called
+            if there is no fresh copy in the cache
+        :type fetch: function
+        :param column: The name of the column holding the geometries
+        :type column: string, optional
+
+        :raise offline_data_missing: This error is raised if the cache is
+            offline and the metadata has never been downloaded
+
+        :return: The dataframe
+        :rtype: pandas.DataFrame
+        """
+        path = self.directory / (name + ".parquet")
+
+        if self.fresh(path):
+            data = pd.read_parquet(path)
+            data[column] = shapely.from_wkb(data[column].values)
+            return data
+
+        if self.offline:
+            raise offline_data_missing(name)
+
+        data = fetch()
+
+        stored = data.copy()
+        stored[column] = shapely.to_wkb(stored[column].values)
+
+        atomic_write(path, lambda temporary: stored.to_parquet(temporary, index=False))
+
+        return data
+
+
+class offline_data_missing(Exception):
+    """Exception raised when running offline and some metadata that is needed has
+    never been downloaded.
+
+    :param name: The name of the metadata that is missing
+    :type name: string
+    """
+
+    def __init__(self, name):
+        self.message = (
+            "Running offline but "
+            + name
+            + " has not been downloaded yet, run once with offline set to False"
+        )
+        super().__init__(self.message)
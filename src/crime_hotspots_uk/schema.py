@@ -0,0 +1,127 @@
+"""
+This module defines the compact types used to hold the crime and stop and search
+data in memory. The data comes from the API as JSON so every column starts out as
+a column of python strings, but most of them only ever hold a few distinct values
+(the same categories, streets and outcomes appear over and over). Storing these as
+categoricals keeps one copy of each value and an integer code per row, which cuts
+the memory used by the data several times over.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# The columns that only hold a small number of distinct values, they are stored as
+# categoricals. The month is stored this way too so its codes count the months in
+# order from the earliest one in the data
+categorical_columns = [
+    # Street level crimes
+    "category",
+    "location_type",
+    "location_subtype",
+    "context",
+    "outcome_status.category",
+    "outcome_status.date",
+    "month",
+    # Stop and searches
+    "type",
+    "gender",
+    "age_range",
+    "self_defined_ethnicity",
+    "officer_defined_ethnicity",
+    "legislation",
+    "object_of_search",
+    "outcome",
+    "outcome_object.id",
+    "outcome_object.name",
+    "operation_name",
+    # Both
+    "location.street.name",
+    "area name",
+]
+
+# The coordinates are stored as 32 bit floats, which is accurate to well under a
+# metre at the latitudes of the UK
+coordinate_columns = ["location.latitude", "location.longitude"]
+
+
+def compact(crimes):
+    """Convert the columns of a dataframe to the compact types
+
+    :param crimes: The crimes or stop and searches, the columns are converted in
+        place
+    :type crimes: pandas.DataFrame
+
+    :return: The same dataframe
+    :rtype: pandas.DataFrame
+    """
+    for column in coordinate_columns:
+        if column in crimes.columns:
+            crimes[column] = pd.to_numeric(crimes[column]).astype(np.float32)
+
+    for column in categorical_columns:
+        if column in crimes.columns and not isinstance(
+            crimes[column].dtype, pd.CategoricalDtype
+        ):
+            crimes[column] = crimes[column].astype("category")
+
+    return crimes
+
+
+def concat(frames):
+    """Join dataframes in the compact types without losing the categoricals
+
+    pandas turns a categorical column back into python strings when the frames
+    being joined have different categories, so the categories of each column are
+    merged and set on every frame first.
+
+    :param frames: The dataframes to join
+    :type frames: list
+
+    :return: The joined dataframe
+    :rtype: pandas.DataFrame
+    """
+    frames = [frame.copy(deep=False) for frame in frames]
+
+    columns = {
+        column
+        for frame in frames
+        for column in frame.columns
+        if isinstance(frame[column].dtype, pd.CategoricalDtype)
+    }
+
+    for column in columns:
+        dtypes = [frame[column].dtype for frame in frames if column in frame.columns]
+
+        # Columns with a fixed set of categories (like the location type) are
+        # already the same in every frame
+        if all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+
+        # The categories can't always be sorted, stop and search outcomes are
+        # a mix of False and strings for instance, so they are merged in the
+        # order they are found. Only the months have to be in order
+        values = [
+            pd.Categorical(
+                pd.Index(
+                    (
+                        frame[column].dtype.categories
+                        if isinstance(frame[column].dtype, pd.CategoricalDtype)
+                        else frame[column].dropna().unique()
+                    ),
+                    dtype=object,
+                )
+            )
+            for frame in frames
+            if column in frame.columns
+        ]
+        categories = union_categoricals(values).categories
+        if column == "month":
+            categories = categories.sort_values()
+        dtype = pd.CategoricalDtype(categories)
+
+        for frame in frames:
+            if column in frame.columns:
+                frame[column] = frame[column].astype(dtype)
+
+    return pd.concat(frames)
@@ -1,15 +1,10 @@
-from crime_hotspots_uk.data import Root, locations_not_fixed_yet
+from crime_hotspots_uk.constants import max_workers
+from crime_hotspots_uk.data import Root
 
 from crime_hotspots_uk.locations.constituincy import Constituincy
 
 import pandas as pd
 
-import os
-
-import numpy as np
-
-from pathlib import Path
-
 
 class Data(Root):
     """
@@ -18,10 +13,24 @@ class Data(Root):
     political representation should be implemented here.
     """
 
-    def __init__(self, name, location_names, location_type=Constituincy):
+    def __init__(
+        self,
+        name,
+        location_names,
+        location_type=Constituincy,
+        workers=max_workers,
+        session=None,
+        offline=False,
+    ):
 
         super().__init__(
-            name, location_names, location_type=Constituincy, usage="search"
+            name,
+            location_names,
+            location_type=location_type,
+            usage="search",
+            workers=workers,
+            session=session,
+            offline=offline,
         )
 
     def get_data(self):
@@ -30,50 +39,24 @@ class Data(Root):
         self.all_crimes["month"] = pd.to_datetime(self.all_crimes["datetime"])
         self.all_crimes["month"] = self.all_crimes["month"].dt.to_period("M")
 
-    def cache_data(self):
-
-        try:
-            self.global_locales.empty
-        except AttributeError:
-            raise locations_not_fixed_yet
-
-        location_type = self.locations.__name__
-
-        cache = os.path.expanduser("~/.crime_hotspots_cache/" + location_type)
-
-        areas = np.unique(self.all_crimes["area name"])
+    def update_data(self):
+        added = super().update_data()
 
-        for area in areas:
-            area_mask = self.all_crimes["area name"] == area
-
-            months = np.unique(self.all_crimes["month"])
-
-            directory = cache + "/" + area + "/" + self.usage
-            Path(directory).mkdir(parents=True, exist_ok=True)
+        self.all_crimes["month"] = pd.to_datetime(self.all_crimes["datetime"])
+        self.all_crimes["month"] = self.all_crimes["month"].dt.to_period("M")
 
-            for month in months:
-                month_mask = self.all_crimes["month"] == month
-                final_mask = area_mask & month_mask
+        return added
 
-                file_name = directory + "/" + str(month) + ".csv"
+    def get_archive_data(self, archives, forces=None):
+        super().get_archive_data(archives, "All crime", forces=forces)
 
-                self.all_crimes[final_mask].to_csv(file_name, index=False)
+        self.all_crimes["month"] = pd.to_datetime(self.all_crimes["datetime"])
+        self.all_crimes["month"] = self.all_crimes["month"].dt.to_period("M")
 
-    def import_cache(self, location_type, area, month, category=None):
-        file_name = os.path.expanduser(
-            "~/.crime_hotspots_cache/"
-            + location_type
-            + "/"
-            + area
-            + "/"
-            + "stops-street"
-            + "/"
-            + month
-            + ".csv"
-        )
+    def warm_cache(self):
+        self.get_data()
+        self.write_cache()
 
-        if Path(file_name).is_file():
-            data = pd.read_csv(file_name)
-            return data
-        else:
-            return None
+    def cache_category(self):
+        # Stop and search data isn't split by category
+        return None
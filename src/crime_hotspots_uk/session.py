@@ -0,0 +1,236 @@
+"""
+This module holds the HTTP session that every request to the data.police.uk API is
+sent through. Sharing one session means connections are kept alive and reused
+instead of a new TCP and TLS handshake being made for every request, and that
+every object using it keeps to the same `API call limits
+<https://data.police.uk/docs/api-call-limits/>`_ together.
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from crime_hotspots_uk.constants import (
+    max_workers,
+    rate_burst,
+    rate_limit,
+    request_timeout,
+)
+
+
+class TokenBucket:
+    """A thread safe token bucket used to limit how often requests are sent.
+
+    The bucket holds up to `burst` tokens and is refilled at `rate` tokens per
+    second. Every request takes one token, if the bucket is empty the request
+    waits until a token has been refilled.
+    """
+
+    def __init__(self, rate=rate_limit, burst=rate_burst):
+        """
+        :param rate: How many tokens are added to the bucket every second
+        :type rate: float, optional
+        :param burst: The maximum number of tokens the bucket can hold
+        :type burst: int, optional
+        """
+        self.rate = rate
+        self.burst = burst
+
+        # Start with a full bucket so the first burst of requests is sent
+        # straight away
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token from the bucket, blocking until one is available"""
+        while True:
+            with self.lock:
+                # Refill the bucket with the tokens that have accumulated since
+                # it was last updated
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                # Work out how long it will be until the next token is added
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class CountingConnection:
+    """Mixed into a urllib3 connection to report every time it opens a socket
+
+    urllib3 keeps using the same connection object when the server closes the
+    socket (as HTTP/1.0 servers do after every response) and just connects it
+    again, so the number of connection objects made by a pool is not the number
+    of handshakes. Counting the calls to connect is.
+    """
+
+    # Called after every successful connect, set by the pool that made it
+    connected = None
+
+    def connect(self):
+        super().connect()
+        if self.connected is not None:
+            self.connected()
+
+
+class CountingHTTPConnection(CountingConnection, HTTPConnection):
+    pass
+
+
+class CountingHTTPSConnection(CountingConnection, HTTPSConnection):
+    pass
+
+
+class CountingPool:
+    """Mixed into a urllib3 connection pool to count the sockets opened by its
+    connections in `num_connects`
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_connects = 0
+        self.connects_lock = threading.Lock()
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.connected = self.count_connect
+        return conn
+
+    def count_connect(self):
+        with self.connects_lock:
+            self.num_connects += 1
+
+
+class CountingHTTPConnectionPool(CountingPool, HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+
+class CountingHTTPSConnectionPool(CountingPool, HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+
+class CountingAdapter(HTTPAdapter):
+    """An HTTPAdapter whose pools count the sockets they open"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class Session:
+    """A pooled, rate limited HTTP session with keep-alive, compression and
+    timeouts
+    """
+
+    def __init__(
+        self,
+        timeout=request_timeout,
+        pool_size=max_workers,
+        transport=None,
+        rate=rate_limit,
+        burst=rate_burst,
+    ):
+        """
+        :param timeout: How many seconds to wait for the API to respond before
+            giving up on a request
+        :type timeout: float, optional
+        :param pool_size: The maximum number of connections kept open to each
+            host, this should be at least as big as the number of downloader
+            workers or connections will be thrown away instead of reused
+        :type pool_size: int, optional
+        :param transport: The adapter used to send the requests, by default a
+            pooled `requests.adapters.HTTPAdapter` is used. Any object
+            implementing the `requests.adapters.BaseAdapter` interface can be
+            passed, for instance to serve responses from disk when testing
+        :type transport: requests.adapters.BaseAdapter, optional
+        :param rate: The maximum sustained number of requests per second sent
+            through the session
+        :type rate: float, optional
+        :param burst: The maximum number of requests that can be sent in one
+            burst
+        :type burst: int, optional
+        """
+        self.timeout = timeout
+
+        # Every request takes a token, so all the downloaders and threads using
+        # the session keep to the limit together
+        self.bucket = TokenBucket(rate, burst)
+
+        if transport is None:
+            # Retries are handled by the downloader so the adapter should not
+            # retry on its own
+            transport = CountingAdapter(
+                pool_connections=1, pool_maxsize=pool_size, max_retries=0
+            )
+        self.transport = transport
+
+        self.session = requests.Session()
+        self.session.mount("https://", transport)
+        self.session.mount("http://", transport)
+
+        # Ask the API to compress the responses and keep the connection open
+        self.session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+
+    def get(self, url):
+        """Send a GET request through the shared connection pool, waiting first
+        if the rate limit has been reached
+
+        :param url: The URL to request
+        :type url: string
+
+        :return: The response from the API
+        :rtype: requests.Response
+        """
+        self.bucket.acquire()
+        return self.session.get(url, timeout=self.timeout)
+
+    def connection_stats(self):
+        """Get how many connections were opened and reused for each host
+
+        :return: A dictionary keyed by host, each value has the number of
+            `requests` sent, the number of `connections` opened and how many
+            requests `reused` an existing connection. If a custom transport
+            without counting connection pools is used this will be empty.
+        :rtype: dict
+        """
+        stats = {}
+
+        poolmanager = getattr(self.transport, "poolmanager", None)
+        if poolmanager is None:
+            return stats
+
+        for key in poolmanager.pools.keys():
+            pool = poolmanager.pools.get(key)
+            if pool is None or not hasattr(pool, "num_connects"):
+                continue
+
+            host = stats.setdefault(
+                pool.host, {"requests": 0, "connections": 0, "reused": 0}
+            )
+            host["requests"] += pool.num_requests
+            host["connections"] += pool.num_connects
+            host["reused"] += pool.num_requests - pool.num_connects
+
+        return stats
+
+    def close(self):
+        """Close all the open connections"""
+        self.session.close()
@@ -0,0 +1,120 @@
+"""
+This module holds the statistical tests used to decide whether a hotspot, or a
+change in one, is more than chance. Each test works on every location at once
+with array operations so whole forces can be tested in one pass.
+"""
+
+import numpy as np
+from scipy.stats import norm
+
+
+def getis_ord(values, weights):
+    """Find the Getis-Ord Gi* statistic of every location
+
+    Gi* compares the total of the values around each location with the total
+    that would be expected if the values were spread at random. It is a z-score,
+    so values above 1.96 are hotspots and values below -1.96 are cold spots at
+    the 5% level.
+
+    :param values: The value at each location, for instance the number of
+        crimes
+    :type values: array like
+    :param weights: The spatial weights between the locations, the weight of a
+        location with itself should be included
+    :type weights: scipy.sparse matrix
+
+    :return: The z-score of each location, locations are NaN if there are fewer
+        than two of them or every value is the same
+    :rtype: numpy.ndarray
+    """
+    values = np.asarray(values, dtype=float)
+    count = len(values)
+
+    if count < 2:
+        return np.full(count, np.nan)
+
+    mean = values.mean()
+    deviation = np.sqrt((values**2).mean() - mean**2)
+
+    # The sums for every location are found with one sparse product each
+    local = np.asarray(weights @ values).reshape(-1)
+    total_weight = np.asarray(weights.sum(axis=1)).reshape(-1)
+    squared_weight = np.asarray(weights.multiply(weights).sum(axis=1)).reshape(-1)
+
+    spread = np.sqrt((count * squared_weight - total_weight**2) / (count - 1))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (local - mean * total_weight) / (deviation * spread)
+
+    # A location whose neighbours are every location can't be compared with
+    # anything so its score is left undefined
+    scores[~np.isfinite(scores)] = np.nan
+    return scores
+
+
+def p_values(scores):
+    """Find the two sided p-value of a set of z-scores
+
+    :param scores: The z-scores
+    :type scores: array like
+
+    :return: The chance of a score at least this far from zero if there was no
+        pattern
+    :rtype: numpy.ndarray
+    """
+    return 2 * norm.sf(np.abs(scores))
+
+
+def mann_kendall(series, chunk_size=10000):
+    """Test every row of a matrix of time series for a trend
+
+    The Mann-Kendall test counts how many later values in each series are above
+    each earlier one minus how many are below, so it picks up any steady rise
+    or fall without assuming the trend is a straight line. The size of the
+    trend is estimated with the Sen slope, the median slope between every pair
+    of values. All the series are tested together with array operations, the
+    only loops are over the months and over chunks of rows.
+
+    :param series: The values with a row for each series and a column for each
+        time step, for instance the number of crimes at each location in each
+        month
+    :type series: array like
+    :param chunk_size: How many series to find the slopes of at once, the
+        slopes between every pair of months are held in memory for each chunk
+    :type chunk_size: int, optional
+
+    :return: The Mann-Kendall statistic `S`, its z-score and the Sen slope of
+        each series in values per time step. The z-score is positive for rising
+        series and zero for series with no variation
+    :rtype: tuple
+    """
+    series = np.asarray(series, dtype=float)
+    count, steps = series.shape
+
+    # Compare each month with every month after it
+    statistic = np.zeros(count)
+    ties = np.zeros((count, steps))
+    for month in range(steps):
+        statistic += np.sign(series[:, month + 1 :] - series[:, [month]]).sum(axis=1)
+        ties[:, month] = (series == series[:, [month]]).sum(axis=1)
+
+    # Each value in a group of t tied values adds (t - 1)(2t + 5) to the sum
+    # over the groups of t(t - 1)(2t + 5) used to correct the variance
+    correction = ((ties - 1) * (2 * ties + 5)).sum(axis=1)
+    variance = (steps * (steps - 1) * (2 * steps + 5) - correction) / 18
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (statistic - np.sign(statistic)) / np.sqrt(variance)
+    scores[~np.isfinite(scores)] = 0
+
+    # The slope between every pair of months, found for a chunk of series at a
+    # time to limit the memory used
+    first, second = np.triu_indices(steps, 1)
+    slopes = np.zeros(count)
+    if len(first) > 0:
+        for start in range(0, count, chunk_size):
+            chunk = series[start : start + chunk_size]
+            pairs = (chunk[:, second] - chunk[:, first]) / (second - first)
+            slopes[start : start + chunk_size] = np.median(pairs, axis=1)
+
+    return statistic, scores, slopes
@@ -0,0 +1,240 @@
+"""
+This module holds spatial helpers that work on whole arrays of coordinates at once
+rather than looping over points in python.
+"""
+
+import numpy as np
+
+import shapely
+from scipy import sparse
+from scipy.spatial import cKDTree
+from shapely.strtree import STRtree
+
+# The mean radius of the earth in metres
+earth_radius = 6371008.8
+
+
+def assign_areas(latitudes, longitudes, shapes):
+    """Find which areas a set of points falls inside
+
+    A spatial index is built over the area shapes so each point is only tested
+    against the shapes whose bounding boxes it falls in.
+
+    :param latitudes: The latitude of each point
+    :type latitudes: array like
+    :param longitudes: The longitude of each point
+    :type longitudes: array like
+    :param shapes: The boundaries of the areas, with longitude as x and
+        latitude as y like the shapes in the location classes
+    :type shapes: list
+
+    :return: Two arrays of the same length, the first holds the index of a
+        point and the second the index of an area it falls in. A point that is
+        in more than one area appears once for each area, a point that is in no
+        area does not appear at all.
+    :rtype: tuple
+    """
+    points = shapely.points(
+        np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float)
+    )
+    tree = STRtree(list(shapes))
+
+    # Use intersects rather than within so points on a boundary are kept
+    point_index, area_index = tree.query(points, predicate="intersects")
+
+    # Sort by point so the output keeps the order of the input points
+    order = np.lexsort((area_index, point_index))
+    return point_index[order], area_index[order]
+
+
+def to_cartesian(latitudes, longitudes):
+    """Convert latitudes and longitudes to points on a unit sphere
+
+    The straight line distance between two points on the sphere only depends on
+    the great circle distance between them, so nearest neighbours found with
+    these points are the same as those found with the haversine formula.
+
+    :param latitudes: The latitude of each point in degrees
+    :type latitudes: array like
+    :param longitudes: The longitude of each point in degrees
+    :type longitudes: array like
+
+    :return: An array with an x, y and z column and a row for each point
+    :rtype: numpy.ndarray
+    """
+    latitudes = np.radians(np.asarray(latitudes, dtype=float))
+    longitudes = np.radians(np.asarray(longitudes, dtype=float))
+
+    return np.column_stack(
+        [
+            np.cos(latitudes) * np.cos(longitudes),
+            np.cos(latitudes) * np.sin(longitudes),
+            np.sin(latitudes),
+        ]
+    )
+
+
+def chord_length(distance):
+    """Convert a distance along the surface of the earth to a chord length
+
+    :param distance: The great circle distance in metres
+    :type distance: float
+
+    :return: The straight line distance between the points on a unit sphere
+    :rtype: float
+    """
+    return 2 * np.sin(np.minimum(distance / earth_radius, np.pi) / 2)
+
+
+def great_circle_distance(chord):
+    """Convert a chord length on a unit sphere to a distance on the earth
+
+    :param chord: The straight line distance between points on a unit sphere
+    :type chord: array like
+
+    :return: The great circle distance in metres
+    :rtype: numpy.ndarray
+    """
+    return 2 * earth_radius * np.arcsin(np.minimum(np.asarray(chord) / 2, 1))
+
+
+def nearest(
+    latitudes, longitudes, target_latitudes, target_longitudes, max_distance=None
+):
+    """Find the nearest target to each of a set of points
+
+    A KD-tree is built over the targets and queried for every point at once.
+
+    :param latitudes: The latitude of each point
+    :type latitudes: array like
+    :param longitudes: The longitude of each point
+    :type longitudes: array like
+    :param target_latitudes: The latitude of each target
+    :type target_latitudes: array like
+    :param target_longitudes: The longitude of each target
+    :type target_longitudes: array like
+    :param max_distance: The furthest away in metres a target can be and still
+        be matched, if this is None there is no limit
+    :type max_distance: float, optional
+
+    :return: Two arrays, the great circle distance in metres to the nearest
+        target and the index of that target. Points with no target in range
+        have a distance of infinity and an index equal to the number of targets
+    :rtype: tuple
+    """
+    points = to_cartesian(latitudes, longitudes)
+    targets = to_cartesian(target_latitudes, target_longitudes)
+
+    if len(targets) == 0:
+        return np.full(len(points), np.inf), np.zeros(len(points), dtype=int)
+
+    if max_distance is None:
+        bound = np.inf
+    else:
+        bound = chord_length(max_distance)
+
+    chords, index = cKDTree(targets).query(points, k=1, distance_upper_bound=bound)
+
+    # Keep the distance of points with no target in range as infinity rather
+    # than converting it to the distance to the opposite side of the earth
+    distances = np.where(np.isinf(chords), np.inf, great_circle_distance(chords))
+
+    return distances, index
+
+
+def neighbour_weights(latitudes, longitudes, distance):
+    """Build a matrix of which points are within a distance of each other
+
+    A KD-tree is built over the points and every pair closer than the distance
+    is found at once, the pairs are stored in a sparse matrix so the memory used
+    grows with the number of neighbours rather than the square of the number of
+    points.
+
+    :param latitudes: The latitude of each point
+    :type latitudes: array like
+    :param longitudes: The longitude of each point
+    :type longitudes: array like
+    :param distance: The furthest apart in metres two points can be and still
+        be neighbours
+    :type distance: float
+
+    :return: A square matrix with a one where two points are neighbours, every
+        point is its own neighbour
+    :rtype: scipy.sparse.csr_matrix
+    """
+    points = to_cartesian(latitudes, longitudes)
+    count = len(points)
+
+    pairs = cKDTree(points).query_pairs(chord_length(distance), output_type="ndarray")
+
+    # The pairs are only listed once, so add them both ways round along with
+    # the diagonal
+    diagonal = np.arange(count)
+    rows = np.concatenate([pairs[:, 0], pairs[:, 1], diagonal])
+    columns = np.concatenate([pairs[:, 1], pairs[:, 0], diagonal])
+
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(count, count)
+    )
+
+
+def to_metres(latitudes, longitudes, origin):
+    """Project latitudes and longitudes onto a flat grid measured in metres
+
+    An equirectangular projection is used, it is accurate to well under a percent
+    across an area the size of a city as long as the origin is near the middle.
+
+    :param latitudes: The latitude of each point in degrees
+    :type latitudes: array like
+    :param longitudes: The longitude of each point in degrees
+    :type longitudes: array like
+    :param origin: The latitude the projection is centred on in degrees
+    :type origin: float
+
+    :return: Two arrays, the distance of each point east and north of the
+        origin in metres
+    :rtype: tuple
+    """
+    scale = np.cos(np.radians(origin))
+    x = earth_radius * np.radians(np.asarray(longitudes, dtype=float)) * scale
+    y = earth_radius * np.radians(np.asarray(latitudes, dtype=float) - origin)
+    return x, y
+
+
+def from_metres(x, y, origin):
+    """Turn points projected with to_metres back into latitudes and longitudes
+
+    :param x: The distance of each point east of the origin in metres
+    :type x: array like
+    :param y: The distance of each point north of the origin in metres
+    :type y: array like
+    :param origin: The latitude the projection is centred on in degrees
+    :type origin: float
+
+    :return: Two arrays, the latitude and longitude of each point in degrees
+    :rtype: tuple
+    """
+    scale = np.cos(np.radians(origin))
+    latitudes = np.degrees(np.asarray(y, dtype=float) / earth_radius) + origin
+    longitudes = np.degrees(np.asarray(x, dtype=float) / earth_radius / scale)
+    return latitudes, longitudes
+
+
+def shape_to_metres(shape, origin):
+    """Project a shape in latitude and longitude with to_metres
+
+    :param shape: The shape, with longitude as x and latitude as y like the
+        shapes in the location classes
+    :type shape: shapely.Geometry
+    :param origin: The latitude the projection is centred on in degrees
+    :type origin: float
+
+    :return: The same shape measured in metres
+    :rtype: shapely.Geometry
+    """
+
+    def project(coordinates):
+        x, y = to_metres(coordinates[:, 1], coordinates[:, 0], origin)
+        return np.column_stack([x, y])
+
+    return shapely.transform(shape, project)
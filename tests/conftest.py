@@ -1,10 +1,67 @@
 """
-    Dummy conftest.py for crime_hotspots_uk.
+Shared fixtures for the tests.
 
-    If you don't know what this is for, just leave it empty.
-    Read more about conftest.py under:
-    - https://docs.pytest.org/en/stable/fixture.html
-    - https://docs.pytest.org/en/stable/writing_plugins.html
+`fake_api` serves a small synthetic copy of the data.police.uk API (see
+fake_api.py) through the pluggable transport of
+`crime_hotspots_uk.session.Session`, so whole downloads can be run without a
+network connection. `make_root` builds objects that talk to it with the cache in
+a temporary home directory.
 """
 
-# import pytest
+import os
+
+import pandas as pd
+import pytest
+from fake_api import FakeLocations, FakePoliceAPI
+
+# Keep the progress bars out of the test output
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+
+@pytest.fixture
+def build_crimes():
+    """Build a few crimes in one month with the columns returned by the API"""
+
+    def build(streets, area, category="burglary"):
+        return pd.DataFrame(
+            {
+                "category": [category] * len(streets),
+                "location.latitude": ["53.800000"] * len(streets),
+                "location.longitude": ["-1.550000"] * len(streets),
+                "location.street.name": streets,
+                "month": ["2021-03"] * len(streets),
+                "area name": [area] * len(streets),
+                "Type": ["Street"] * len(streets),
+            }
+        )
+
+    return build
+
+
+@pytest.fixture
+def fake_api():
+    """A fake police API serving the crimes from build_points"""
+    return FakePoliceAPI()
+
+
+@pytest.fixture
+def make_root(tmp_path, monkeypatch, fake_api):
+    """Build Root objects that download from fake_api and cache in tmp_path"""
+    from crime_hotspots_uk.data import Root
+    from crime_hotspots_uk.session import Session
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    def make(api=fake_api, usage="crime", workers=4, **kwargs):
+        return Root(
+            "Test",
+            ["West", "East"],
+            location_type=FakeLocations,
+            usage=usage,
+            workers=workers,
+            # There is no need to keep to the rate limits of the real API
+            session=Session(transport=api, rate=1e6, burst=1e6),
+            **kwargs
+        )
+
+    return make
@@ -0,0 +1,203 @@
+"""
+A small synthetic copy of the data.police.uk API.
+
+`FakePoliceAPI` is a transport for `crime_hotspots_uk.session.Session` that
+answers the calls the package makes from a fixed set of crimes, so whole
+downloads can be run without a network connection. `FakeLocations` is a
+location type with two areas inside the region the crimes are in.
+"""
+
+import json
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+
+import dateutil
+import numpy as np
+import pandas as pd
+import requests
+import shapely
+from requests.adapters import BaseAdapter
+from shapely.geometry import MultiPolygon, Polygon, box
+
+categories = [
+    {"url": "all-crime", "name": "All crime"},
+    {"url": "violent-crime", "name": "Violence and sexual offences"},
+    {"url": "burglary", "name": "Burglary"},
+]
+
+streets = [
+    "On or near High Street",
+    "On or near Low Road",
+    "On or near Mill Lane",
+    "On or near Supermarket",
+    "On or near Parking Area",
+]
+
+# Two areas side by side, the second one is made of two polygons
+area_shapes = {
+    "West": MultiPolygon([box(-1.70, 53.70, -1.55, 53.90)]),
+    "East": MultiPolygon(
+        [box(-1.55, 53.70, -1.40, 53.80), box(-1.55, 53.80, -1.40, 53.90)]
+    ),
+}
+
+
+def window():
+    """The months Root.get_months asks for, oldest first"""
+    end = date.today() - dateutil.relativedelta.relativedelta(months=1)
+    start = end - dateutil.relativedelta.relativedelta(months=37)
+    return (
+        pd.date_range(start, end, freq="MS", inclusive="left")
+        .strftime("%Y-%m")
+        .tolist()
+    )
+
+
+def build_points(count=600, seed=1):
+    """Build the crimes served by the fake API
+
+    The crimes are snapped to 60 points like the real data, and only the last
+    three months of the window have any crimes.
+    """
+    rng = np.random.default_rng(seed)
+
+    latitudes = rng.uniform(53.70, 53.90, 60).round(6)
+    longitudes = rng.uniform(-1.70, -1.40, 60).round(6)
+    point = rng.integers(0, 60, count)
+
+    return pd.DataFrame(
+        {
+            "id": np.arange(count),
+            "latitude": latitudes[point],
+            "longitude": longitudes[point],
+            "street": np.array(streets)[point % len(streets)],
+            "month": np.array(window()[-3:])[rng.integers(0, 3, count)],
+            "category": np.array(["violent-crime", "burglary"])[
+                rng.integers(0, 2, count)
+            ],
+        }
+    )
+
+
+class FakePoliceAPI(BaseAdapter):
+    """A transport that answers requests like the police API would"""
+
+    def __init__(self, points=None, limit=10000, published=None):
+        """
+        :param points: The crimes to serve, as built by build_points
+        :type points: pandas.DataFrame, optional
+        :param limit: How many crimes can be returned for one request before
+            the API says the area is too big with a 503
+        :type limit: int, optional
+        :param published: The months listed by crimes-street-dates, by default
+            every month in the window
+        :type published: list, optional
+        """
+        super().__init__()
+        self.points = build_points() if points is None else points
+        self.limit = limit
+        self.published = window() if published is None else published
+        self.urls = []
+
+    def calls(self, method=None):
+        """Count the requests sent, optionally only to one API method"""
+        return len([url for url in self.urls if method is None or method in url])
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+
+        url = urlparse(request.url)
+        query = parse_qs(url.query)
+
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = 200
+
+        if "crime-categories" in url.path:
+            body = categories
+        elif "crimes-street-dates" in url.path:
+            body = [
+                {"date": month, "stop-and-search": ["west-yorkshire"]}
+                for month in self.published
+            ]
+        elif "locate-neighbourhood" in url.path:
+            body = {"force": "west-yorkshire", "neighbourhood": "NE1"}
+        else:
+            body = self.crimes(url.path, query)
+            if body is None:
+                response.status_code = 503
+                body = []
+
+        response._content = json.dumps(body).encode()
+        response.headers["Content-Type"] = "application/json"
+        return response
+
+    def crimes(self, path, query):
+        """Find the crimes or stop and searches inside a poly= request"""
+        pairs = [point.split(",") for point in query["poly"][0].split(":")]
+        polygon = Polygon([(float(lng), float(lat)) for lat, lng in pairs])
+
+        points = self.points
+        inside = (points["month"] == query["date"][0]).to_numpy() & shapely.contains_xy(
+            polygon, points["longitude"], points["latitude"]
+        )
+
+        category = path.rsplit("/", 1)[-1]
+        if category not in ("all-crime", "stops-street"):
+            inside &= (points["category"] == category).to_numpy()
+
+        rows = points[inside]
+        if rows.shape[0] > self.limit:
+            return
+
+        if category == "stops-street":
+            return [
+                {
+                    "type": "Person search",
+                    "involved_person": True,
+                    "datetime": row.month + "-15T12:00:00+00:00",
+                    "outcome": False if row.id % 2 else "Arrest",
+                    "location": {
+                        "latitude": str(row.latitude),
+                        "longitude": str(row.longitude),
+                        "street": {"id": 1, "name": row.street},
+                    },
+                    "gender": "Male",
+                }
+                for row in rows.itertuples()
+            ]
+
+        return [
+            {
+                "category": row.category,
+                "location_type": "Force",
+                "location": {
+                    "latitude": str(row.latitude),
+                    "longitude": str(row.longitude),
+                    "street": {"id": 1, "name": row.street},
+                },
+                "context": "",
+                "outcome_status": None,
+                "persistent_id": "p" + str(row.id),
+                "id": int(row.id),
+                "location_subtype": "",
+                "month": row.month,
+            }
+            for row in rows.itertuples()
+        ]
+
+    def close(self):
+        pass
+
+
+class FakeLocations:
+    """A location type holding the two areas in area_shapes"""
+
+    __name__ = "FakeLocations"
+
+    def __init__(self, names, title, offline=False):
+        self.title = title
+        self.locations = pd.DataFrame(
+            {"Name": names, "shapes": [area_shapes[name] for name in names]}
+        )
@@ -0,0 +1,114 @@
+import zipfile
+
+import pytest
+from shapely.geometry import MultiPolygon, box
+
+from crime_hotspots_uk.archives import read_archive
+
+street_header = (
+    "Crime ID,Month,Reported by,Falls within,Longitude,Latitude,Location,"
+    "LSOA code,LSOA name,Crime type,Last outcome category,Context\n"
+)
+
+street_rows = [
+    # Inside the first area
+    "a1,2021-03,WYP,WYP,-1.55,53.80,On or near High Street,E1,L1,"
+    "Violence and sexual offences,Under investigation,\n",
+    # Inside the second area
+    "a2,2021-03,WYP,WYP,-1.45,53.80,On or near Low Road,E1,L1,"
+    "Burglary,Under investigation,\n",
+    # Outside both areas
+    "a3,2021-03,WYP,WYP,-1.00,53.00,On or near Far Lane,E1,L1,"
+    "Violence and sexual offences,Under investigation,\n",
+    # No location
+    ",2021-03,WYP,WYP,,,No Location,,,Anti-social behaviour,,\n",
+    # Anti-social behaviour has no crime id
+    ",2021-03,WYP,WYP,-1.56,53.81,On or near Mill Lane,E1,L1,"
+    "Anti-social behaviour,,\n",
+]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """A small archive with the same layout as the ones on data.police.uk"""
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, "w") as zipped:
+        zipped.writestr(
+            "2021-03/2021-03-west-yorkshire-street.csv",
+            street_header + "".join(street_rows),
+        )
+        zipped.writestr(
+            "2021-04/2021-04-west-yorkshire-street.csv",
+            street_header + street_rows[0].replace("2021-03", "2021-04"),
+        )
+        zipped.writestr(
+            "2021-03/2021-03-north-yorkshire-street.csv",
+            street_header + street_rows[0].replace("a1", "n1"),
+        )
+        zipped.writestr("2021-03/2021-03-west-yorkshire-outcomes.csv", "")
+    return path
+
+
+shapes = [
+    MultiPolygon([box(-1.6, 53.75, -1.5, 53.85)]),
+    MultiPolygon([box(-1.5, 53.75, -1.4, 53.85)]),
+]
+names = ["West", "East"]
+
+
+class TestArchives:
+    def test_clips_to_areas(self, archive):
+        crimes = read_archive(
+            archive,
+            "crimes-street",
+            shapes,
+            names,
+            months=["2021-03"],
+            forces=["west-yorkshire"],
+        )
+
+        assert crimes["persistent_id"].fillna("").tolist() == ["a1", "a2", ""]
+        assert crimes["area name"].tolist() == ["West", "East", "West"]
+        assert crimes["location.street.name"].tolist() == [
+            "On or near High Street",
+            "On or near Low Road",
+            "On or near Mill Lane",
+        ]
+
+    def test_filters_months_forces_and_categories(self, archive):
+        crimes = read_archive(
+            archive,
+            "crimes-street",
+            shapes,
+            names,
+            categories={"Violence and sexual offences": "violent-crime"},
+        )
+
+        assert sorted(crimes["persistent_id"].tolist()) == ["a1", "a1", "n1"]
+        assert set(crimes["category"]) == {"violent-crime"}
+        assert sorted(set(crimes["month"])) == ["2021-03", "2021-04"]
+
+    def test_overlapping_archives(self, archive):
+        # The next month's archive holds the same files again
+        seen = set()
+        first = read_archive(archive, "crimes-street", shapes, names, seen=seen)
+        second = read_archive(archive, "crimes-street", shapes, names, seen=seen)
+
+        assert second is None
+        assert (first["category"] == "Anti-social behaviour").sum() == 1
+        assert seen == {
+            ("west-yorkshire", "2021-03", "crimes-street"),
+            ("west-yorkshire", "2021-04", "crimes-street"),
+            ("north-yorkshire", "2021-03", "crimes-street"),
+        }
+
+    def test_nothing_found(self, archive):
+        crimes = read_archive(
+            archive,
+            "crimes-street",
+            shapes,
+            names,
+            months=["2019-01"],
+        )
+
+        assert crimes is None
@@ -0,0 +1,189 @@
+import time
+
+import pandas as pd
+from fake_api import FakeLocations, window
+
+from crime_hotspots_uk.cache import Cache
+from crime_hotspots_uk.searches import Data
+from crime_hotspots_uk.session import Session
+
+day = 24 * 60 * 60
+
+
+def new_requests(api, since):
+    """Get the months of the crime requests sent after a number of requests"""
+    return {url.split("date=")[1][:7] for url in api.urls[since:] if "poly=" in url}
+
+
+class TestManifest:
+    def test_hit_miss_and_negative(self, make_root, fake_api):
+        months = window()
+
+        cold = make_root()
+        cold.get_data("Burglary")
+        cold.write_cache()
+        category = cold.cache_category()
+
+        # Only the last three months have crimes, the others are recorded as
+        # empty so they are never requested again
+        assert cold.cache.lookup("West", category, months[0])["rows"] == 0
+        assert cold.cache.lookup("West", category, months[-1])["rows"] > 0
+        assert cold.cache.lookup("West", category, "1999-01") is None
+
+        cold.cache.forget("West", category, months[-1])
+        cold.cache.save()
+
+        # Only the month that was forgotten is downloaded again
+        sent = len(fake_api.urls)
+        warm = make_root()
+        warm.get_data("Burglary")
+
+        assert new_requests(fake_api, sent) == {months[-1]}
+        assert warm.all_crimes.shape[0] == cold.all_crimes.shape[0]
+
+    def test_ttl_expiry(self, make_root, fake_api):
+        months = window()
+
+        cold = make_root()
+        cold.get_data("Burglary")
+        cold.write_cache()
+        category = cold.cache_category()
+
+        # Recent months go stale after a week, old ones are settled
+        for month in [months[0], months[-1]]:
+            key = cold.cache.key("West", category, month)
+            cold.cache.manifest[key]["fetched"] -= 8 * day
+        cold.cache.save()
+
+        assert cold.cache.lookup("West", category, months[-1]) is None
+        assert cold.cache.lookup("West", category, months[0]) is not None
+
+        sent = len(fake_api.urls)
+        make_root().get_data("Burglary")
+
+        assert new_requests(fake_api, sent) == {months[-1]}
+
+
+class TestBudget:
+    def test_prune_least_recently_used(self, tmp_path):
+        cache = Cache("Test", "crimes-street", directory=str(tmp_path), budget=None)
+        crimes = pd.DataFrame({"id": range(100)})
+
+        months = ["2021-01", "2021-02", "2021-03"]
+        for month in months:
+            cache.write(crimes, "Leeds", "burglary", month)
+        cache.write(crimes.iloc[:0], "Leeds", "burglary", "2020-12")
+
+        # Make the months settled so none of them have expired, then use them
+        # in the order December (which was empty), February, January, March
+        now = time.time()
+        for i, month in enumerate(["2020-12", "2021-02", "2021-01", "2021-03"]):
+            entry = cache.manifest[cache.key("Leeds", "burglary", month)]
+            entry["fetched"] = now
+            entry["accessed"] = now - 10 + i
+
+        size = cache.manifest[cache.key("Leeds", "burglary", months[0])]["bytes"]
+
+        assert cache.prune(budget=2 * size) == 1
+        assert cache.lookup("Leeds", "burglary", "2021-02") is None
+        assert not cache.path("Leeds", "burglary", "2021-02").exists()
+
+        assert cache.prune(budget=size) == 1
+        assert cache.lookup("Leeds", "burglary", "2021-01") is None
+        assert cache.lookup("Leeds", "burglary", "2021-03") is not None
+
+        # The empty month was used least recently but is kept as it takes up
+        # no space
+        assert cache.prune(budget=0) == 1
+        assert cache.lookup("Leeds", "burglary", "2020-12")["rows"] == 0
+
+    def test_torn_write(self, tmp_path):
+        cache = Cache("Test", "crimes-street", directory=str(tmp_path))
+        cache.write(pd.DataFrame({"id": [1]}), "Leeds", "burglary", "2021-03")
+        cache.set_mark("Leeds", "burglary", "2021-03")
+        cache.save()
+
+        # A save that was stopped part way through leaves a half written
+        # temporary file, the manifest itself is untouched
+        cache.manifest_path.with_suffix(".tmp").write_text('{"partitions": [{"ar')
+
+        cache = Cache("Test", "crimes-street", directory=str(tmp_path))
+        assert cache.lookup("Leeds", "burglary", "2021-03")["rows"] == 1
+        assert cache.mark("Leeds", "burglary") == "2021-03"
+
+        # A broken manifest is treated as empty and can be saved over
+        text = cache.manifest_path.read_text()
+        cache.manifest_path.write_text(text[: len(text) // 2])
+
+        cache = Cache("Test", "crimes-street", directory=str(tmp_path))
+        assert cache.lookup("Leeds", "burglary", "2021-03") is None
+
+        cache.write(pd.DataFrame({"id": [1]}), "Leeds", "burglary", "2021-03")
+        cache.save()
+        cache = Cache("Test", "crimes-street", directory=str(tmp_path))
+        assert cache.lookup("Leeds", "burglary", "2021-03")["rows"] == 1
+
+
+class TestCacheFiles:
+    def test_write_partitions(self, make_root, tmp_path):
+        root = make_root()
+        root.get_data("Burglary")
+        root.write_cache()
+
+        category = root.cache_category()
+        crimes = root.all_crimes
+
+        # One file for each area and month with crimes, and nothing left half
+        # written
+        for (area, month), rows in (
+            crimes.groupby(["area name", "month"], observed=True).size().items()
+        ):
+            path = root.cache.path(area, category, month)
+            assert pd.read_parquet(path).shape[0] == rows
+        assert list(tmp_path.rglob("*.tmp")) == []
+
+    def test_read_months(self, make_root):
+        root = make_root()
+        root.get_data("Burglary")
+        root.write_cache()
+
+        category = root.cache_category()
+        crimes = root.all_crimes
+        months = window()
+
+        # All the months are read in one go, with only the columns asked for
+        west = crimes[crimes["area name"] == "West"]
+        found, missing = root.cache.read_months(
+            "West", category, months[-3:] + ["1999-01"], columns=["id", "month"]
+        )
+        assert list(found.columns) == ["id", "month"]
+        assert sorted(found["id"]) == sorted(west["id"])
+        assert missing == ["1999-01"]
+
+
+class TestStopAndSearch:
+    def searches(self, api):
+        searches = Data(
+            "Test",
+            ["West", "East"],
+            location_type=FakeLocations,
+            session=Session(transport=api, rate=1e6, burst=1e6),
+        )
+        return searches
+
+    def test_mixed_outcomes(self, tmp_path, monkeypatch, fake_api):
+        monkeypatch.setenv("HOME", str(tmp_path))
+
+        # The outcome is False when nothing was found and a string otherwise
+        cold = self.searches(fake_api)
+        cold.get_data()
+        cold.write_cache()
+
+        sent = len(fake_api.urls)
+        warm = self.searches(fake_api)
+        warm.get_data()
+
+        assert len(fake_api.urls) == sent
+        outcomes = warm.all_crimes["outcome"].astype(object)
+        assert set(outcomes) == {False, "Arrest"}
+        assert outcomes.tolist() == cold.all_crimes["outcome"].astype(object).tolist()
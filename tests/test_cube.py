@@ -0,0 +1,56 @@
+import pandas as pd
+
+from crime_hotspots_uk.cube import CountCube, month_range
+from crime_hotspots_uk.significance import mann_kendall
+
+
+class TestCountCube:
+    def test_totals_and_trend(self, build_crimes):
+        cube = CountCube()
+        cube.add(
+            build_crimes(["High Street", "High Street", "Low Road"], "Leeds"),
+            pd.Series(["2021-02", "2021-03", "2021-02"]),
+        )
+
+        totals = cube.totals(["location.street.name"])
+        assert totals["location.street.name"].tolist() == ["High Street", "Low Road"]
+        assert totals["crimes"].tolist() == [2, 1]
+
+        trend = cube.trend({"location.street.name": ["High Street"]})
+        assert trend.to_dict() == {"2021-02": 1, "2021-03": 1}
+
+    def test_add_new_months(self, build_crimes):
+        cube = CountCube()
+        cube.add(build_crimes(["High Street"], "Leeds"), pd.Series(["2021-03"]))
+        cube.add(
+            build_crimes(["High Street", "Mill Lane"], "York", "robbery"),
+            pd.Series(["2021-01", "2021-04"]),
+        )
+
+        assert list(cube.months) == ["2021-01", "2021-03", "2021-04"]
+        assert cube.trend().tolist() == [1, 1, 1]
+        assert cube.totals(["area name"], months=["2021-03"])["crimes"].tolist() == [1]
+
+        cube.keep_months(["2021-04"])
+        assert cube.totals(["category"])["category"].tolist() == ["robbery"]
+
+    def test_series_gap_months(self, build_crimes):
+        cube = CountCube()
+        cube.add(
+            build_crimes(["High Street"] * 3, "Leeds"),
+            pd.Series(["2021-01", "2021-02", "2021-06"]),
+        )
+
+        # The months with no crimes at all are counted as zero rather than left
+        # out, and months outside the data are zero too
+        labels, series = cube.series(["location.street.name"])
+        assert series.tolist() == [[1, 1, 0, 0, 0, 1]]
+
+        labels, series = cube.series(
+            ["location.street.name"], months=month_range("2020-12", "2021-06")
+        )
+        assert series.tolist() == [[0, 1, 1, 0, 0, 0, 1]]
+
+        # Counting the gap months as zero changes the trend
+        statistic, scores, slopes = mann_kendall(series[:, 1:])
+        assert statistic[0] != 0
@@ -0,0 +1,314 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from fake_api import FakePoliceAPI, area_shapes, window
+
+# The columns compared between runs, the order of the rows can differ
+columns = [
+    "id",
+    "area name",
+    "category",
+    "month",
+    "location.latitude",
+    "location.longitude",
+    "location.street.name",
+    "Type",
+]
+
+
+def snapshot(crimes):
+    """Put crimes in a form that can be compared between runs"""
+    crimes = crimes[columns].astype(str)
+    return crimes.sort_values(["area name", "id"]).reset_index(drop=True)
+
+
+class TestCaching:
+    @pytest.mark.parametrize("fetch_all", [False, True])
+    def test_warm_run_matches_cold_run(self, make_root, fake_api, fetch_all):
+        cold = make_root(fetch_all=fetch_all)
+        cold.get_data("Burglary")
+        downloaded = snapshot(cold.all_crimes)
+
+        cold.fix_locations()
+        fixed = snapshot(cold.all_crimes)
+        cold.write_cache()
+
+        requests = fake_api.calls()
+
+        warm = make_root(fetch_all=fetch_all)
+        warm.get_data("Burglary")
+
+        # Everything comes from the cache, with the street names the police
+        # gave and the type of every location
+        assert fake_api.calls() == requests
+        assert snapshot(warm.all_crimes).equals(downloaded)
+
+        warm.fix_locations()
+        assert snapshot(warm.all_crimes).equals(fixed)
+
+    def test_metadata_cached(self, make_root, fake_api):
+        cold = make_root(usage="search")
+        cold.get_data("All crime")
+
+        # The published months and the forces of each area (one for each of
+        # their polygons) are only downloaded once
+        warm = make_root(usage="search")
+        warm.get_data("All crime")
+
+        assert fake_api.calls("crimes-street-dates") == 1
+        assert fake_api.calls("locate-neighbourhood") == 3
+
+
+class TestUpdate:
+    def test_update_fixes_old_rows_again(self, make_root, tmp_path):
+        months = window()[-2:]
+
+        # A crime near a supermarket with only High Street nearby, then a month
+        # later a crime on Mill Lane right next to the supermarket
+        api = FakePoliceAPI(
+            pd.DataFrame(
+                {
+                    "id": [0, 1, 2],
+                    "latitude": [53.8, 53.81, 53.8],
+                    "longitude": [-1.6, -1.6, -1.6001],
+                    "street": [
+                        "On or near Supermarket",
+                        "On or near High Street",
+                        "On or near Mill Lane",
+                    ],
+                    "month": [months[0], months[0], months[1]],
+                    "category": ["burglary"] * 3,
+                }
+            ),
+            published=window()[:-1],
+        )
+
+        root = make_root(api=api)
+        root.get_data("Burglary")
+        root.fix_locations()
+        root.count_cube()
+
+        streets = root.cube.totals(["location.street.name"])
+        assert set(streets["location.street.name"]) == {"High Street"}
+
+        # The next month is published and the cached list of months expires
+        api.published = window()
+        root.published = None
+        path = tmp_path / ".crime_hotspots_cache/metadata/crimes-street-dates.json"
+        os.utime(path, (0, 0))
+        assert root.update_data() == 1
+
+        crimes = root.all_crimes.set_index("id")
+        assert crimes.loc[0, "location.street.name"] == "Mill Lane"
+        assert crimes.loc[0, "Type"] == "Supermarket"
+
+        totals = root.count_cube().totals(["location.street.name"])
+        assert dict(zip(totals["location.street.name"], totals["crimes"])) == {
+            "Mill Lane": 2,
+            "High Street": 1,
+        }
+
+
+class TestGetCrimes:
+    @pytest.mark.parametrize("fetch_all", [False, True])
+    def test_only_wanted_categories(self, make_root, fetch_all):
+        root = make_root(fetch_all=fetch_all)
+        root.get_data("Burglary")
+
+        coords = [(-1.70, 53.70), (-1.55, 53.70), (-1.55, 53.90), (-1.70, 53.90)]
+        crimes = root.get_crimes(coords, "Box")
+
+        assert set(crimes["category"]) == {"burglary"}
+        assert set(crimes["area name"]) == {"Box"}
+
+        # The same crimes as the area with the same boundary
+        west = root.all_crimes[root.all_crimes["area name"] == "West"]
+        assert sorted(crimes["id"]) == sorted(west["id"])
+
+
+class TestSubdivision:
+    def test_split_keeps_every_crime(self, make_root):
+        whole_api = FakePoliceAPI()
+        whole = make_root(api=whole_api)
+        whole.get_data("All crime")
+
+        # The API refuses any request with more than 15 crimes, so the region
+        # is split into smaller and smaller quarters
+        split_api = FakePoliceAPI(limit=15)
+        split = make_root(api=split_api)
+        split.cache.manifest = {}
+        split.get_data("All crime")
+
+        assert split_api.calls("poly=") > whole_api.calls("poly=")
+        assert snapshot(split.all_crimes).equals(snapshot(whole.all_crimes))
+
+
+class TestPlanner:
+    def test_one_request_per_month(self, make_root, fake_api):
+        root = make_root()
+        root.get_data("All crime")
+
+        # The two areas share a border so they are requested as one region
+        assert len(root.plan_requests(list(area_shapes.values()))) == 1
+        assert fake_api.calls("poly=") == len(window())
+
+        # Every crime is inside one of the areas and is given to that area once
+        assert root.all_crimes.shape[0] == fake_api.points.shape[0]
+        for name, shape in area_shapes.items():
+            crimes = root.all_crimes[root.all_crimes["area name"] == name]
+            assert shapely.contains_xy(
+                shape, crimes["location.longitude"], crimes["location.latitude"]
+            ).all()
+
+
+class TestDropSeen:
+    def test_drop_seen(self, make_root):
+        root = make_root()
+        seen = set()
+
+        # Crimes without an id can't be told apart so they are always kept
+        first = pd.DataFrame({"persistent_id": ["a", "b", "a", "", ""]})
+        kept = root.drop_seen(first, seen)
+        assert kept["persistent_id"].tolist() == ["a", "b", "", ""]
+
+        second = pd.DataFrame({"persistent_id": ["a", "c", ""]})
+        kept = root.drop_seen(second, seen)
+        assert kept["persistent_id"].tolist() == ["c", ""]
+        assert seen == {"a", "b", "c"}
+
+
+def served_points(api, latitudes, longitudes):
+    """Find the point the fake API snapped crimes to nearest each location
+
+    :return: The street the police gave the point without the `On or near`
+        prefix, where it is and the number of crimes at it
+    """
+    points = api.points.groupby(["latitude", "longitude", "street"]).size()
+    points = points.rename("crimes").reset_index()
+    points["street"] = points["street"].str.replace("On or near ", "")
+
+    latitudes = np.subtract.outer(np.asarray(latitudes), points["latitude"].to_numpy())
+    longitudes = np.subtract.outer(
+        np.asarray(longitudes), points["longitude"].to_numpy()
+    )
+    distances = latitudes**2 + longitudes**2
+    return points.iloc[distances.argmin(axis=1)].reset_index(drop=True)
+
+
+def in_areas(areas, latitudes, longitudes):
+    """Check every location is inside the area it was given"""
+    return all(
+        shapely.contains_xy(area_shapes[area], longitude, latitude)
+        for area, latitude, longitude in zip(areas, latitudes, longitudes)
+    )
+
+
+class TestDensityHotspots:
+    def test_cells(self, make_root, fake_api):
+        root = make_root()
+        root.get_data("All crime")
+
+        # The cells are much smaller than the gaps between the points so each
+        # one holds at most one point, and without smoothing they are ranked by
+        # the number of crimes in them
+        cells = root.density_hotspots(cell_size=200, bandwidth=0)
+        assert cells["density"].is_monotonic_decreasing
+        assert cells["crimes"].sum() == root.all_crimes.shape[0]
+
+        # Each cell with crimes is in the area of its point and takes its name
+        cells = cells[cells["crimes"] > 0]
+        points = served_points(fake_api, cells["latitude"], cells["longitude"])
+        assert cells["crimes"].tolist() == points["crimes"].tolist()
+        assert cells["street"].tolist() == points["street"].tolist()
+        assert in_areas(cells["area name"], points["latitude"], points["longitude"])
+
+    def test_smoothed_cells_are_named(self, make_root):
+        root = make_root()
+        root.get_data("All crime")
+
+        # Smoothing spreads crimes into empty cells, they take the name of the
+        # nearest point
+        cells = root.density_hotspots(top=10)
+        assert cells.shape[0] == 10
+        assert cells["density"].is_monotonic_decreasing
+        assert (cells["crimes"] == 0).any()
+        assert cells["street"].notna().all()
+
+
+class TestSignificantHotspots:
+    def test_points(self, make_root, fake_api):
+        root = make_root()
+        root.get_data("All crime")
+
+        # Every point the crimes were snapped to is ranked by its score
+        locations = root.significant_hotspots()
+        assert (
+            locations.shape[0]
+            == fake_api.points.groupby(["latitude", "longitude"]).ngroups
+        )
+        assert locations["z score"].is_monotonic_decreasing
+        assert locations["crimes"].sum() == root.all_crimes.shape[0]
+
+        points = served_points(fake_api, locations["latitude"], locations["longitude"])
+        assert locations["crimes"].tolist() == points["crimes"].tolist()
+        assert locations["street"].tolist() == points["street"].tolist()
+        assert in_areas(locations["area name"], points["latitude"], points["longitude"])
+
+        top = root.significant_hotspots(top=3)
+        pd.testing.assert_frame_equal(top, locations.iloc[:3])
+
+    def test_cells(self, make_root):
+        root = make_root()
+        root.get_data("All crime")
+
+        # The cells are the same as the unsmoothed density grid
+        cells = root.significant_hotspots(cell_size=2000)
+        grid = root.density_hotspots(cell_size=2000, bandwidth=0)
+        assert cells["z score"].is_monotonic_decreasing
+
+        keys = ["area name", "latitude", "longitude", "crimes", "street"]
+        pd.testing.assert_frame_equal(
+            cells[keys].sort_values(keys[:3], ignore_index=True),
+            grid[keys].sort_values(keys[:3], ignore_index=True),
+        )
+
+        # The busiest cells stand out from their neighbours
+        assert cells["crimes"].iloc[0] > cells["crimes"].mean()
+        assert cells["p value"].iloc[0] < 0.05
+
+
+class TestEmergingHotspots:
+    def test_empty_months_count(self, make_root):
+        root = make_root()
+        root.get_data("All crime")
+
+        # Only the last three months have crimes, the empty months before them
+        # are part of the trend so every location is rising
+        trends = root.emerging_hotspots()
+        assert (trends["S"] > 0).all()
+        assert trends["z score"].is_monotonic_decreasing
+        assert trends["crimes"].sum() == root.all_crimes.shape[0]
+
+    def test_top_and_location_type(self, make_root):
+        root = make_root()
+        root.get_data("All crime")
+        trends = root.emerging_hotspots()
+
+        pd.testing.assert_frame_equal(root.emerging_hotspots(top=3), trends.iloc[:3])
+
+        supermarkets = root.emerging_hotspots(location_type=["Supermarket"])
+        assert supermarkets["locations"].str.contains("Supermarket").all()
+        assert (
+            supermarkets["crimes"].sum()
+            == (root.all_crimes["Type"] == "Supermarket").sum()
+        )
+
+        streets = root.emerging_hotspots(top=4, location_type=["Street"])
+        assert streets.shape[0] == 4
+        assert not streets["locations"].str.contains("Supermarket|Parking").any()
+
+        with pytest.raises(AssertionError):
+            root.emerging_hotspots(location_type=["Somewhere"])
@@ -0,0 +1,61 @@
+import json
+
+import pandas as pd
+import pytest
+
+from crime_hotspots_uk.decoder import crime_fields, decode_response, records
+
+crimes = [
+    {
+        "category": "burglary",
+        "location_type": "Force",
+        "location": {
+            "latitude": "53.800000",
+            "longitude": "-1.550000",
+            "street": {"id": 1, "name": "On or near High Street"},
+        },
+        "context": "",
+        "outcome_status": {"category": "Under investigation", "date": "2021-03"},
+        "persistent_id": "abc",
+        "id": 1,
+        "location_subtype": "",
+        "month": "2021-03",
+    },
+    {
+        "category": "violent-crime",
+        "location_type": "Force",
+        "location": {
+            "latitude": "53.810000",
+            "longitude": "-1.560000",
+            "street": {"id": 2, "name": "On or near Low Road"},
+        },
+        "context": "",
+        "outcome_status": None,
+        "persistent_id": "",
+        "id": 2,
+        "location_subtype": "",
+        "month": "2021-03",
+    },
+]
+
+
+class TestDecoder:
+    def test_same_as_json_normalize(self):
+        decoded = decode_response(json.dumps(crimes, indent=1), "crimes-street")
+
+        # json_normalize leaves out the fields under a null object, they are
+        # empty in the decoded frame instead
+        expected = pd.json_normalize(crimes).reindex(columns=crime_fields)
+        expected.loc[1, "outcome_status.category"] = None
+        expected.loc[1, "outcome_status.date"] = None
+
+        assert list(decoded.columns) == crime_fields
+        assert decoded.astype(object).equals(expected.astype(object))
+
+    def test_empty_and_invalid(self):
+        assert decode_response(" [ ] ", "crimes-street").shape == (0, len(crime_fields))
+
+        with pytest.raises(ValueError):
+            list(records('{"error": true}'))
+        with pytest.raises(ValueError):
+            list(records("[1 2]"))
@@ -0,0 +1,26 @@
+import numpy as np
+
+from crime_hotspots_uk.density import count_grid, grid_extent, smooth_grid
+
+
+class TestDensity:
+    def test_count_grid(self):
+        extent = grid_extent((0, 0, 250, 150), 100)
+        assert extent == (0, 0, 3, 2)
+
+        counts = count_grid([10, 20, 150, 240], [10, 30, 120, 50], 100, extent)
+
+        assert counts.tolist() == [[2, 0], [0, 1], [1, 0]]
+
+    def test_smooth_grid_keeps_total(self):
+        counts = np.zeros((21, 21))
+        counts[10, 10] = 5
+
+        density = smooth_grid(counts, 100, 50)
+
+        assert np.isclose(density.sum(), 5)
+        assert np.unravel_index(density.argmax(), density.shape) == (10, 10)
+        assert (density >= 0).all()
+
+        # No smoothing leaves the counts as they are
+        assert smooth_grid(counts, 0, 50).tolist() == counts.tolist()
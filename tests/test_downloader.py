@@ -0,0 +1,99 @@
+import json
+import random
+import time
+
+import pandas as pd
+import requests
+from fake_api import FakePoliceAPI
+from requests.adapters import BaseAdapter
+
+from crime_hotspots_uk.downloader import Downloader
+from crime_hotspots_uk.session import Session
+
+
+class ScriptedAPI(BaseAdapter):
+    """A transport that answers with a list of status codes in turn, then 200,
+    after a short random delay so concurrent requests finish out of order
+    """
+
+    def __init__(self, codes=()):
+        super().__init__()
+        self.codes = list(codes)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        time.sleep(random.uniform(0, 0.01))
+
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = self.codes.pop(0) if self.codes else 200
+        response.headers["Retry-After"] = "0"
+        response._content = json.dumps(request.url).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+class TestRateLimit:
+    def test_shared_by_session(self):
+        api = ScriptedAPI()
+        session = Session(transport=api, rate=50, burst=2)
+
+        # Two downloaders on the same session share one limit, so the second
+        # has to wait for the burst the first one used up
+        start = time.monotonic()
+        Downloader(session, workers=2).get_all(["http://test/1", "http://test/2"])
+        Downloader(session, workers=2).get_all(["http://test/3", "http://test/4"])
+
+        assert api.sent == 4
+        assert time.monotonic() - start >= 0.035
+
+
+class TestDownloader:
+    def downloader(self, api, workers=4, retries=5):
+        session = Session(transport=api, rate=1e6, burst=1e6)
+        return Downloader(session, workers, retries=retries)
+
+    def test_retries(self):
+        api = ScriptedAPI([429, 500, 502])
+
+        assert self.downloader(api).get("http://test/").status_code == 200
+        assert api.sent == 4
+
+        # 503 means the area is too big, asking again won't help
+        api = ScriptedAPI([503])
+        assert self.downloader(api).get("http://test/").status_code == 503
+        assert api.sent == 1
+
+    def test_gives_up(self):
+        api = ScriptedAPI([429] * 10)
+
+        assert self.downloader(api, retries=2).get("http://test/").status_code == 429
+        assert api.sent == 3
+
+    def test_keeps_order(self):
+        urls = ["http://test/" + str(i) for i in range(50)]
+
+        responses = self.downloader(ScriptedAPI()).get_all(urls)
+
+        assert [response.json() for response in responses] == urls
+
+
+class TestConcurrentDownloads:
+    def test_same_as_serial(self, make_root):
+        serial_api = FakePoliceAPI()
+        serial = make_root(api=serial_api, workers=1)
+        serial.get_data("All crime")
+
+        # Both download every month, the empty months recorded by the first
+        # run are forgotten
+        concurrent_api = FakePoliceAPI()
+        concurrent = make_root(api=concurrent_api, workers=8)
+        concurrent.cache.manifest = {}
+        concurrent.get_data("All crime")
+
+        assert concurrent_api.calls("poly=") == serial_api.calls("poly=")
+        pd.testing.assert_frame_equal(serial.all_crimes, concurrent.all_crimes)
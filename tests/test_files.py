@@ -0,0 +1,45 @@
+import pytest
+
+from crime_hotspots_uk.files import atomic_write
+
+
+class TestAtomicWrite:
+    def test_failed_write_keeps_old_file(self, tmp_path):
+        path = tmp_path / "folder" / "data.json"
+        atomic_write(path, lambda temporary: temporary.write_text("old"))
+
+        def fail(temporary):
+            temporary.write_text("half")
+            raise OSError("disk full")
+
+        with pytest.raises(OSError):
+            atomic_write(path, fail)
+
+        # The half written temporary file is cleaned up
+        assert path.read_text() == "old"
+        assert [file.name for file in path.parent.iterdir()] == ["data.json"]
+
+        atomic_write(path, lambda temporary: temporary.write_text("new"))
+        assert path.read_text() == "new"
+        assert [file.name for file in path.parent.iterdir()] == ["data.json"]
+
+    def test_temporary_files_not_shared(self, tmp_path):
+        path = tmp_path / "data.json"
+        temporaries = []
+
+        # A second write that starts while the first is still going gets a
+        # temporary file of its own
+        def outer(temporary):
+            temporaries.append(temporary)
+            atomic_write(path, inner)
+            temporary.write_text("outer")
+
+        def inner(temporary):
+            temporaries.append(temporary)
+            temporary.write_text("inner")
+
+        atomic_write(path, outer)
+
+        assert temporaries[0] != temporaries[1]
+        assert path.read_text() == "outer"
+        assert [file.name for file in tmp_path.iterdir()] == ["data.json"]
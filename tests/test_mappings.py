@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from crime_hotspots_uk import mappings
+from crime_hotspots_uk.mappings import MappingStore
+
+mill_lane = (53.8001, -1.6, "Mill Lane")
+high_street = (53.81, -1.6, "High Street")
+church_road = (53.7, -1.6, "Church Road")
+
+supermarket = (53.8, -1.6, "Supermarket")
+park = (53.71, -1.6, "Park")
+
+
+def build_locations(streets):
+    """Build locations from (latitude, longitude, street name) tuples"""
+    return pd.DataFrame(
+        streets,
+        columns=["location.latitude", "location.longitude", "location.street.name"],
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MappingStore("Test", directory=str(tmp_path))
+
+
+@pytest.fixture
+def matched(monkeypatch):
+    """Record how many points and locales each nearest search is given"""
+    calls = []
+
+    def counting(latitudes, longitudes, locale_latitudes, locale_longitudes):
+        calls.append((len(latitudes), len(locale_latitudes)))
+        return nearest(latitudes, longitudes, locale_latitudes, locale_longitudes)
+
+    nearest = mappings.nearest
+    monkeypatch.setattr(mappings, "nearest", counting)
+    return calls
+
+
+def resolve(store, locales, points=[supermarket]):
+    """Resolve points in Leeds against a set of locales"""
+    resolved = store.resolve("Leeds", build_locations(locales), build_locations(points))
+    return resolved["new name"].tolist()
+
+
+class TestMappingStore:
+    def test_locale_removed(self, store, matched):
+        assert resolve(store, [mill_lane, high_street]) == ["Mill Lane"]
+
+        # The locale the point was mapped to isn't in the data any more, only
+        # that point is matched against the current locales
+        matched.clear()
+        assert resolve(store, [high_street]) == ["High Street"]
+        assert matched == [(1, 1)]
+
+        # What is stored is still right for the first set of locales
+        matched.clear()
+        assert resolve(store, [mill_lane, high_street]) == ["Mill Lane"]
+        assert matched == []
+
+    def test_locale_added(self, store, matched):
+        points = [supermarket, park]
+        assert resolve(store, [high_street], points) == ["High Street"] * 2
+
+        # The new locale is only closer to the park, the stored points are only
+        # checked against the new locale
+        matched.clear()
+        assert resolve(store, [high_street, church_road], points) == [
+            "High Street",
+            "Church Road",
+        ]
+        assert matched == [(2, 1)]
+
+        stored = store.load("Leeds", "mappings")
+        assert stored["new name"].tolist() == ["High Street", "Church Road"]
+
+    def test_shared_between_datasets(self, store, matched):
+        burglary = [mill_lane, high_street]
+        violence = [mill_lane, church_road]
+
+        resolve(store, burglary)
+        resolve(store, violence)
+
+        # Going back to the first dataset uses the stored mappings for all
+        # the points
+        matched.clear()
+        assert resolve(store, burglary) == ["Mill Lane"]
+        assert matched == []
+
+        assert len(store.load("Leeds", "locales")) == 3
+        assert sorted(path.name for path in store.directory.glob("*/*")) == [
+            "locales.parquet",
+            "mappings.parquet",
+        ]
+
+    def test_no_locales(self, store):
+        assert resolve(store, []) == [None]
+        assert resolve(store, [high_street]) == ["High Street"]
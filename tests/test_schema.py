@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from crime_hotspots_uk.schema import compact, concat
+
+
+class TestSchema:
+    def test_compact(self, build_crimes):
+        crimes = compact(build_crimes(["High Street", "Low Road"], "Leeds"))
+
+        assert crimes["location.latitude"].dtype == np.float32
+        for column in ["category", "location.street.name", "month", "area name"]:
+            assert isinstance(crimes[column].dtype, pd.CategoricalDtype)
+
+    def test_concat_keeps_categoricals(self, build_crimes):
+        first = compact(build_crimes(["High Street"], "Leeds"))
+        second = compact(build_crimes(["Low Road", "High Street"], "York"))
+
+        crimes = concat([first, second])
+
+        streets = crimes["location.street.name"]
+        assert isinstance(streets.dtype, pd.CategoricalDtype)
+        assert list(streets) == ["High Street", "Low Road", "High Street"]
+        assert list(crimes["area name"]) == ["Leeds", "York", "York"]
+
+        # The frames that were joined are left as they were
+        assert list(first["area name"].cat.categories) == ["Leeds"]
+
+    def test_concat_mixed_categories(self, build_crimes):
+        # Stop and search outcomes are False when nothing was done
+        first = compact(build_crimes(["High Street"], "Leeds").assign(outcome=[False]))
+        second = compact(
+            build_crimes(["Low Road"], "York").assign(
+                outcome=["Arrest"], month=["2021-01"]
+            )
+        )
+
+        crimes = concat([first, second])
+
+        assert list(crimes["outcome"]) == [False, "Arrest"]
+        assert list(crimes["month"].cat.categories) == ["2021-01", "2021-03"]
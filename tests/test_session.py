@@ -0,0 +1,64 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crime_hotspots_uk.session import Session, TokenBucket
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveHandler(Handler):
+    protocol_version = "HTTP/1.1"
+
+
+def count(handler, requests=5):
+    """Send some requests to a local server and get the connection stats"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    session = Session(timeout=5)
+    try:
+        for _ in range(requests):
+            response = session.get("http://127.0.0.1:%d/" % server.server_port)
+            assert response.status_code == 200
+        return session.connection_stats()["127.0.0.1"]
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+
+class TestConnectionStats:
+    def test_keep_alive(self):
+        assert count(KeepAliveHandler) == {"requests": 5, "connections": 1, "reused": 4}
+
+    def test_server_closes_connections(self):
+        # An HTTP/1.0 server closes the connection after every response
+        assert count(Handler) == {"requests": 5, "connections": 5, "reused": 0}
+
+
+class TestTokenBucket:
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=50, burst=5)
+
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start < 0.05
+
+        # Once the burst is used up the requests are spaced out by the rate
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.09
@@ -0,0 +1,49 @@
+import numpy as np
+
+from crime_hotspots_uk.significance import getis_ord, mann_kendall
+from crime_hotspots_uk.spatial import neighbour_weights
+
+
+class TestGetisOrd:
+    def test_neighbour_weights(self):
+        # Two points about 100 metres apart and one a kilometre away
+        weights = neighbour_weights([53.8, 53.8009, 53.809], [-1.55] * 3, 200)
+
+        assert weights.toarray().tolist() == [[1, 1, 0], [1, 1, 0], [0, 0, 1]]
+
+    def test_cluster_scores_highest(self):
+        latitudes = 53.8 + np.arange(10) * 0.001
+        crimes = [20, 20, 20, 1, 1, 1, 1, 1, 1, 1]
+
+        scores = getis_ord(crimes, neighbour_weights(latitudes, [-1.55] * 10, 150))
+
+        assert scores.argmax() == 1
+        assert scores[1] > 1.96
+        assert scores[-1] < 0
+
+    def test_constant_values(self):
+        weights = neighbour_weights([53.8, 53.81], [-1.55, -1.55], 100)
+
+        assert np.isnan(getis_ord([3, 3], weights)).all()
+
+
+class TestMannKendall:
+    def test_trends(self):
+        series = [
+            [1, 2, 3, 4, 5, 6],
+            [6, 5, 4, 3, 2, 1],
+            [2, 2, 2, 2, 2, 2],
+            [0, 0, 1, 1, 2, 2],
+        ]
+
+        statistic, scores, slopes = mann_kendall(series)
+
+        assert statistic.tolist() == [15, -15, 0, 12]
+        assert scores[0] > 1.96
+        assert scores[1] < -1.96
+        assert scores[2] == 0
+        assert slopes.tolist() == [1, -1, 0, 0.5]
+
+        # The ties in the last series shrink the variance, so its score is
+        # higher than it would be without the correction
+        assert np.isclose(scores[3], 11 / np.sqrt((510 - 3 * 18) / 18))